@@ -0,0 +1,339 @@
+import argparse
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from data_loading import data_version, list_column, shared_data
+from facets import facet_counts, restaurant_facets, travel_facets
+from filters import combine_masks, restaurant_masks, restaurants_index, search_mask, travel_index, travel_masks
+from instrumentation import record_cache, register_cache_size, span
+from pdf_export import DAGEN_PER_WEEK, planning_key, weekplanning_pdf_bytes
+from search import rank_rows, restaurants_search_index, search_scores, travel_search_index
+
+logger = logging.getLogger(__name__)
+
+# --- Instellingen ---
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# Zoveel JSON-antwoorden blijven bewaard, per dataversie en query
+RESPONSE_CACHE_SIZE = 256
+
+
+# --- Data ---
+async def _frames():
+    # De gedeelde frames van data_loading. Enkel de allereerste lading blokkeert
+    # en gebeurt in een thread, zodat de event loop vrij blijft; daarna ververst
+    # data_loading op de achtergrond.
+    if shared_data.frames is None:
+        return await run_in_threadpool(shared_data.get)
+    return shared_data.get()
+
+
+class ResponseCache:
+    # Geserialiseerde antwoorden per ETag; die bevat de dataversie, dus een
+    # nieuwe versie maakt oude items vanzelf onbereikbaar.
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._items.get(key)
+            if body is not None:
+                self._items.move_to_end(key)
+        record_cache("api_response", body is not None)
+        return body
+
+    def put(self, key, body):
+        with self._lock:
+            self._items[key] = body
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def size(self):
+        with self._lock:
+            return sum(len(body) for body in self._items.values()), len(self._items)
+
+
+_responses = ResponseCache(RESPONSE_CACHE_SIZE)
+register_cache_size("api_response", _responses.size)
+
+
+# --- Queryparameters ---
+class BadRequest(Exception):
+    pass
+
+
+def _values(params, name):
+    # ?land=België&land=Frankrijk of ?land=België,Frankrijk
+    return [v.strip() for raw in params.getlist(name) for v in raw.split(',') if v.strip()]
+
+
+def _number(params, name):
+    raw = params.get(name)
+    if raw in (None, ''):
+        return None
+    try:
+        return float(raw)
+    except ValueError:
+        raise BadRequest(f"{name} moet een getal zijn")
+
+
+def _range(params, name):
+    # Ontbrekende grens = onbegrensd; lege cellen vallen, zoals in de app, altijd weg
+    return _number(params, f"{name}_min"), _number(params, f"{name}_max")
+
+
+def _page(params):
+    try:
+        page = int(params.get('page', 1))
+        page_size = int(params.get('page_size', PAGE_SIZE))
+    except ValueError:
+        raise BadRequest("page en page_size moeten gehele getallen zijn")
+    if page < 1 or not 1 <= page_size <= MAX_PAGE_SIZE:
+        raise BadRequest(f"page >= 1 en 1 <= page_size <= {MAX_PAGE_SIZE}")
+    return page, page_size
+
+
+def _scores(search_index, df, params):
+    # ?q=... : vrije tekst, resultaten op relevantie
+    query = params.get('q', '').strip()
+    return search_scores(search_index(df), query) if query else None
+
+
+def _travel_masks(index, params):
+    return travel_masks(
+        index,
+        _range(params, 'duur'),
+        _range(params, 'budget'),
+        _values(params, 'continent'),
+        _values(params, 'reistype'),
+        _values(params, 'seizoen'),
+        _values(params, 'accommodatie'),
+        _range(params, 'temperatuur'),
+        _values(params, 'vervoersmiddel'),
+        _values(params, 'land'),
+        _values(params, 'regio'),
+        _values(params, 'stad')
+    )
+
+
+def _restaurant_masks(index, params):
+    return restaurant_masks(
+        index,
+        _values(params, 'keuken'),
+        _range(params, 'prijs'),
+        _values(params, 'land'),
+        _values(params, 'regio'),
+        _values(params, 'stad')
+    )
+
+
+# --- Antwoorden ---
+def _etag(*parts):
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return '"' + hashlib.sha1(payload.encode('utf-8')).hexdigest() + '"'
+
+
+def _not_modified(request, etag):
+    return etag in [t.strip() for t in request.headers.get('if-none-match', '').split(',')]
+
+
+async def _cached_json(request, etag, build):
+    # 304 als de client deze versie al heeft; anders uit de cache of opgebouwd
+    # in een thread, zodat de event loop vrij blijft voor andere clients.
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    body = _responses.get(etag)
+    if body is None:
+        try:
+            body = await run_in_threadpool(build)
+        except BadRequest as e:
+            return _error(400, str(e))
+        _responses.put(etag, body)
+    return Response(body, media_type='application/json', headers=headers)
+
+
+def _error(status, message):
+    return JSONResponse({'error': message}, status_code=status)
+
+
+def _dumps(payload):
+    return json.dumps(payload, ensure_ascii=False, default=_json_default).encode('utf-8')
+
+
+def _json_default(value):
+    if isinstance(value, (np.integer, np.floating)):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is niet JSON-serialiseerbaar")
+
+
+def _records(df, schema_lists):
+    # De ;-kolommen als lijsten, lege getallen als null
+    lists = [list_column(col) for col in schema_lists if list_column(col) in df.columns]
+    page = df.drop(columns=[col for col in schema_lists if col in df.columns and list_column(col) in lists])
+    page = page.rename(columns={list_column(col): col for col in schema_lists})
+    return json.loads(page.to_json(orient='records', force_ascii=False))
+
+
+def _result_page(df, rows, page, page_size, lists, counts=None):
+    start = (page - 1) * page_size
+    selected = df.iloc[rows[start:start + page_size]]
+    payload = {
+        'data_version': data_version(df),
+        'total': int(len(rows)),
+        'page': page,
+        'page_size': page_size,
+        'items': _records(selected, lists),
+    }
+    if counts is not None:
+        payload['counts'] = counts
+    return _dumps(payload)
+
+
+def _query(request):
+    return sorted(request.query_params.multi_items())
+
+
+# --- Endpoints ---
+async def reizen(request):
+    travel_df, _ = await _frames()
+    if travel_df.empty:
+        return _error(503, "Geen reisdata beschikbaar.")
+    params = request.query_params
+
+    def build():
+        with span("api_travel", rows_in=len(travel_df)) as s:
+            page, page_size = _page(params)
+            index = travel_index(travel_df)
+            scores = _scores(travel_search_index, travel_df, params)
+            masks = search_mask(_travel_masks(index, params), scores)
+            rows = rank_rows(np.flatnonzero(combine_masks(index, masks.values())), scores)
+            counts = facet_counts(index, masks) if params.get('counts') == '1' else None
+            s.set(rows_out=len(rows))
+            return _result_page(travel_df, rows, page, page_size, ['seizoen', 'vervoersmiddel'], counts)
+
+    return await _cached_json(request, _etag('reizen', data_version(travel_df), _query(request)), build)
+
+
+async def restaurants(request):
+    _, restaurants_df = await _frames()
+    if restaurants_df.empty:
+        return _error(503, "Geen restaurantdata beschikbaar.")
+    params = request.query_params
+
+    def build():
+        with span("api_restaurants", rows_in=len(restaurants_df)) as s:
+            page, page_size = _page(params)
+            if 'prijs' not in restaurants_df.columns:
+                # Zoals filter_restaurants_in_memory: zonder prijs geen filter
+                rows = np.arange(len(restaurants_df))
+                counts = None
+            else:
+                index = restaurants_index(restaurants_df)
+                scores = _scores(restaurants_search_index, restaurants_df, params)
+                masks = search_mask(_restaurant_masks(index, params), scores)
+                rows = rank_rows(np.flatnonzero(combine_masks(index, masks.values())), scores)
+                counts = facet_counts(index, masks) if params.get('counts') == '1' else None
+            s.set(rows_out=len(rows))
+            return _result_page(restaurants_df, rows, page, page_size, ['maaltijd'], counts)
+
+    return await _cached_json(request, _etag('restaurants', data_version(restaurants_df), _query(request)), build)
+
+
+async def facetten(request):
+    travel_df, restaurants_df = await _frames()
+    soort = request.path_params['soort']
+    if soort == 'reizen':
+        df, facets_fn = travel_df, travel_facets
+    elif soort == 'restaurants':
+        df, facets_fn = restaurants_df, restaurant_facets
+    else:
+        return _error(404, f"Onbekende facetten: {soort}")
+    if df.empty:
+        return _error(503, "Geen data beschikbaar.")
+
+    def build():
+        return _dumps({'data_version': data_version(df), 'facets': facets_fn(df)})
+
+    return await _cached_json(request, _etag('facetten', soort, data_version(df)), build)
+
+
+def _weken(weken, dagen):
+    # [eerste, laatste] als JSON-lijst van twee gehele getallen binnen de planning
+    if weken is None:
+        return None
+    aantal = -(-dagen // DAGEN_PER_WEEK)
+    if not (isinstance(weken, list) and len(weken) == 2 and all(type(w) is int for w in weken)):
+        raise ValueError("weken moet [eerste, laatste] zijn")
+    if not 1 <= weken[0] <= weken[1] <= aantal:
+        raise ValueError(f"weken moet tussen 1 en {aantal} liggen")
+    return tuple(weken)
+
+
+async def pdf(request):
+    # POST {"weekplanning": [{"bestemming", "ontbijt", "lunch", "diner"}, ...],
+    #       "weken": [1, 2], "details": true}
+    try:
+        body = await request.json()
+        weekplanning = body['weekplanning']
+        if not isinstance(weekplanning, list) or not all(isinstance(d, dict) and 'bestemming' in d for d in weekplanning):
+            raise ValueError("weekplanning moet een lijst dagen met een bestemming zijn")
+        if not weekplanning:
+            raise ValueError("lege weekplanning")
+        weken = _weken(body.get('weken'), len(weekplanning))
+    except (ValueError, KeyError, TypeError) as e:
+        return _error(400, f"Ongeldige planning: {e}")
+
+    _, restaurants_df = await _frames()
+    restaurants_df = restaurants_df if body.get('details', True) and not restaurants_df.empty else None
+    etag = '"' + planning_key(weekplanning, restaurants_df, weken) + '"'
+    headers = {'ETag': etag, 'Content-Disposition': 'attachment; filename="weekplanning.pdf"'}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    try:
+        data = await run_in_threadpool(weekplanning_pdf_bytes, weekplanning, restaurants_df, weken)
+    except ValueError as e:
+        return _error(400, f"Ongeldige planning: {e}")
+    return Response(data, media_type='application/pdf', headers=headers)
+
+
+async def versie(request):
+    travel_df, restaurants_df = await _frames()
+    return JSONResponse({
+        'reizen': data_version(travel_df),
+        'restaurants': data_version(restaurants_df),
+    })
+
+
+app = Starlette(routes=[
+    Route('/reizen', reizen),
+    Route('/restaurants', restaurants),
+    Route('/facetten/{soort}', facetten),
+    Route('/pdf', pdf, methods=['POST']),
+    Route('/versie', versie),
+])
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="HTTP/JSON-API over de reis- en restaurantdata")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args(argv)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
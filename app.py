@@ -1,8 +1,17 @@
 import streamlit as st
-from filters import filter_travel_in_memory, filter_restaurants_in_memory
-from kaartweergave import bestemming_kaartje, restaurant_kaartje
-from data_loading import load_travel_data, load_restaurants_data
+from filters import filter_travel_in_memory, filter_restaurants_in_memory, travel_index, travel_masks, restaurants_index, restaurant_masks, search_mask
+from search import travel_search_index, restaurants_search_index, search_scores
+from ranking import DEFAULT_WEIGHTS, TOP_K, rank_travel_in_memory, without_preferences
+from facets import travel_facets, restaurant_facets, facet_counts, clamp_range
+from kaartweergave import bestemming_kaartjes_html, restaurant_kaartjes_html, toon_resultaten
+from data_loading import load_all_data, load_travel_data, load_restaurants_data, shared_data
 from plan_je_dag import plan_je_dag_tab
+from instrumentation import finish_run, is_enabled, set_enabled, snapshot as perf_snapshot, span, start_run
+
+def met_aantal(counts, col):
+    # Toont bij elke optie hoeveel resultaten ze (nog) oplevert
+    col_counts = counts.get(col, {})
+    return lambda x: f"{x} ({col_counts.get(x, 0)})"
 
 def main():
     if 'needs_refresh' not in st.session_state:
@@ -15,8 +24,9 @@ def main():
 
     # Refresh knop
     def on_refresh_click():
-        load_travel_data.clear()
-        load_restaurants_data.clear()
+        # Ververst op de achtergrond; tot dan blijft de huidige data staan
+        if load_all_data.clear():
+            st.toast("De data wordt ververst…")
         st.session_state['needs_refresh'] = True
 
     col1, col2 = st.columns([8, 1])
@@ -35,101 +45,133 @@ def main():
         st.session_state['needs_refresh'] = False
         st.rerun()
 
+    if shared_data.last_error:
+        st.warning(shared_data.last_error)
+
     if selected_tab == "Reislocaties":
         data = load_travel_data()
         if data.empty:
             st.warning("Geen reisdata beschikbaar.")
             st.stop()
-        # Vul relevante kolommen met lege string
-        for col in ['land', 'regio', 'stad', 'continent', 'reistype / doel', 'seizoen', 'accommodatie', 'vervoersmiddel']:
-            if col in data.columns:
-                data[col] = data[col].fillna('')
-
-        min_duur = int(data['minimum duur'].min())
-        max_duur = int(data['maximum duur'].max())
-        min_budget = int(data['budget'].min())
-        max_budget = int(data['budget'].max())
-        min_temp = int(data['temperatuur'].min()) if 'temperatuur' in data.columns else 0
-        max_temp = int(data['temperatuur'].max()) if 'temperatuur' in data.columns else 40
-
-        land_options = sorted([x for x in data['land'].unique() if x])
-        regio_options = sorted([x for x in data['regio'].unique() if x])
-        stad_options = sorted([x for x in data['stad'].unique() if x])
-        continent_options = sorted([x for x in data['continent'].unique() if x])
-        reistype_options = sorted([x for x in data['reistype / doel'].unique() if x])
-
-        seizoen_raw_options = data['seizoen'].unique()
-        seizoen_split = set()
-        for item in seizoen_raw_options:
-            for s in str(item).split(';'):
-                s = s.strip()
-                if s:
-                    seizoen_split.add(s)
-        seizoen_options = sorted(seizoen_split)
-
-        accommodatie_options = sorted([x for x in data['accommodatie'].unique() if x])
-        vervoersmiddelen_options = sorted(set(
-            v.strip()
-            for row in data['vervoersmiddel'].dropna()
-            for v in row.split(';')
-        )) if 'vervoersmiddel' in data.columns else []
-
-        land = st.sidebar.multiselect('Land', land_options, key='filter_land')
-        regio = st.sidebar.multiselect('Regio', regio_options, key='filter_regio')
-        stad = st.sidebar.multiselect('Stad', stad_options, key='filter_stad')
-        continent = st.sidebar.multiselect('Op welk continent?', continent_options, key='filter_continent')
-        reistype = st.sidebar.multiselect('Reistype', reistype_options, key='filter_reistype')
-        seizoen = st.sidebar.multiselect('Seizoen', seizoen_options, key='filter_seizoen')
-        accommodatie = st.sidebar.multiselect('Accommodatie', accommodatie_options, key='filter_accommodatie')
-        vervoersmiddelen = st.sidebar.multiselect('Vervoersmiddel', vervoersmiddelen_options, key='filter_vervoersmiddel')
-
-        duur_slider = st.sidebar.slider('Duur (dagen)', min_duur, max_duur, (min_duur, max_duur), step=1)
-        budget_slider = st.sidebar.slider('Budget', min_budget, max_budget, (min_budget, max_budget), step=100)
-        temp_slider = st.sidebar.slider('Temperatuur (°C)', min_temp, max_temp, (min_temp, max_temp), step=1)
-
-        filtered_data = filter_travel_in_memory(
-            data,
-            duur_slider,
-            budget_slider,
-            continent,
-            reistype,
-            seizoen,
-            accommodatie,
-            temp_slider,
-            vervoersmiddelen,
-            land,
-            regio,
-            stad
+        facets = travel_facets(data)
+        min_duur, max_duur = facets['duur']
+        min_budget, max_budget = facets['budget']
+        min_temp, max_temp = facets['temperatuur']
+
+        # Aantallen per optie, op basis van de keuzes die al in de sessie staan
+        state = st.session_state
+        index = travel_index(data)
+        zoekterm = state.get('filter_zoek', '').strip()
+        scores = search_scores(travel_search_index(data), zoekterm) if zoekterm else None
+        rangschikken = state.get('filter_rangschikken', False)
+        masks = travel_masks(
+            index,
+            clamp_range(state.get('filter_duur'), facets['duur']),
+            clamp_range(state.get('filter_budget'), facets['budget']),
+            state.get('filter_continent', []),
+            state.get('filter_reistype', []),
+            state.get('filter_seizoen', []),
+            state.get('filter_accommodatie', []),
+            clamp_range(state.get('filter_temp'), facets['temperatuur']),
+            state.get('filter_vervoersmiddel', []),
+            state.get('filter_land', []),
+            state.get('filter_regio', []),
+            state.get('filter_stad', [])
+        )
+        if rangschikken:
+            # Voorkeuren filteren niet, dus tellen ook niet mee in de aantallen
+            masks = without_preferences(masks)
+        counts = facet_counts(index, search_mask(masks, scores))
+
+        st.sidebar.text_input('Zoeken', key='filter_zoek', placeholder='Naam, plaats, opmerking…')
+        st.sidebar.checkbox(
+            'Rangschikken op voorkeur',
+            key='filter_rangschikken',
+            help='Budget, duur, temperatuur, seizoen, vervoersmiddel en reistype filteren niet maar bepalen de volgorde: de best passende locaties eerst.'
         )
+        land = st.sidebar.multiselect('Land', facets.get('land', []), key='filter_land', format_func=met_aantal(counts, 'land'))
+        regio = st.sidebar.multiselect('Regio', facets.get('regio', []), key='filter_regio', format_func=met_aantal(counts, 'regio'))
+        stad = st.sidebar.multiselect('Stad', facets.get('stad', []), key='filter_stad', format_func=met_aantal(counts, 'stad'))
+        continent = st.sidebar.multiselect('Op welk continent?', facets.get('continent', []), key='filter_continent', format_func=met_aantal(counts, 'continent'))
+        reistype = st.sidebar.multiselect('Reistype', facets.get('reistype / doel', []), key='filter_reistype', format_func=met_aantal(counts, 'reistype / doel'))
+        seizoen = st.sidebar.multiselect('Seizoen', facets.get('seizoen', []), key='filter_seizoen', format_func=met_aantal(counts, 'seizoen'))
+        accommodatie = st.sidebar.multiselect('Accommodatie', facets.get('accommodatie', []), key='filter_accommodatie', format_func=met_aantal(counts, 'accommodatie'))
+        vervoersmiddelen = st.sidebar.multiselect('Vervoersmiddel', facets.get('vervoersmiddel', []), key='filter_vervoersmiddel', format_func=met_aantal(counts, 'vervoersmiddel'))
+
+        duur_slider = st.sidebar.slider('Duur (dagen)', min_duur, max_duur, (min_duur, max_duur), step=1, key='filter_duur')
+        budget_slider = st.sidebar.slider('Budget', min_budget, max_budget, (min_budget, max_budget), step=100, key='filter_budget')
+        temp_slider = st.sidebar.slider('Temperatuur (°C)', min_temp, max_temp, (min_temp, max_temp), step=1, key='filter_temp')
+
+        if rangschikken:
+            with st.sidebar.expander('Gewichten'):
+                gewichten = {
+                    naam: st.slider(naam.capitalize(), 0.0, 3.0, gewicht, step=0.5, key=f'gewicht_{naam}')
+                    for naam, gewicht in DEFAULT_WEIGHTS.items()
+                }
+            filtered_data, kandidaten = rank_travel_in_memory(
+                data,
+                duur_slider,
+                budget_slider,
+                continent,
+                reistype,
+                seizoen,
+                accommodatie,
+                temp_slider,
+                vervoersmiddelen,
+                land,
+                regio,
+                stad,
+                zoekterm,
+                gewichten,
+                TOP_K
+            )
+            st.caption(f"De {len(filtered_data)} best passende van {kandidaten} locaties")
+        else:
+            filtered_data = filter_travel_in_memory(
+                data,
+                duur_slider,
+                budget_slider,
+                continent,
+                reistype,
+                seizoen,
+                accommodatie,
+                temp_slider,
+                vervoersmiddelen,
+                land,
+                regio,
+                stad,
+                zoekterm
+            )
         if not filtered_data.empty:
-            for _, row in filtered_data.iterrows():
-                bestemming_kaartje(row)
+            toon_resultaten(filtered_data, bestemming_kaartjes_html, key='reizen')
         else:
             st.write("Geen locaties gevonden.")
 
     elif selected_tab == "Restaurants":
         restaurants_df = load_restaurants_data()
-        st.write("Alle restaurants:")
-        st.write(restaurants_df)
-
         if restaurants_df.empty:
             st.warning("Geen restaurantdata beschikbaar.")
             st.stop()
-        # Vul alle relevante kolommen op met lege strings
-        for col in ['land', 'regio', 'stad', 'keuken', 'maaltijd', 'prijs']:
-            if col in restaurants_df.columns:
-                restaurants_df[col] = restaurants_df[col].fillna('')
-
-        keuken_options = sorted([k for k in restaurants_df['keuken'].unique() if k])
-        land_options = sorted([l for l in restaurants_df['land'].unique() if l])
-        regio_options = sorted([r for r in restaurants_df['regio'].unique() if r])
-        stad_options = sorted([s for s in restaurants_df['stad'].unique() if s])
-
-        selected_keuken = st.sidebar.multiselect("Kies type keuken", keuken_options)
-        selected_land = st.sidebar.multiselect("Land", land_options)
-        selected_regio = st.sidebar.multiselect("Regio", regio_options)
-        selected_stad = st.sidebar.multiselect("Stad", stad_options)
-        prijs_slider = st.sidebar.slider("Prijsniveau (€ - €€€€)", 1, 4, (1, 4), step=1)
+        facets = restaurant_facets(restaurants_df)
+        state = st.session_state
+        index = restaurants_index(restaurants_df)
+        zoekterm = state.get('restaurant_zoek', '').strip()
+        scores = search_scores(restaurants_search_index(restaurants_df), zoekterm) if zoekterm else None
+        counts = facet_counts(index, search_mask(restaurant_masks(
+            index,
+            state.get('restaurant_keuken', []),
+            state.get('restaurant_prijs', (1, 4)),
+            state.get('restaurant_land', []),
+            state.get('restaurant_regio', []),
+            state.get('restaurant_stad', [])
+        ), scores))
+
+        st.sidebar.text_input('Zoeken', key='restaurant_zoek', placeholder='Naam, keuken, plaats…')
+        selected_keuken = st.sidebar.multiselect("Kies type keuken", facets.get('keuken', []), key='restaurant_keuken', format_func=met_aantal(counts, 'keuken'))
+        selected_land = st.sidebar.multiselect("Land", facets.get('land', []), key='restaurant_land', format_func=met_aantal(counts, 'land'))
+        selected_regio = st.sidebar.multiselect("Regio", facets.get('regio', []), key='restaurant_regio', format_func=met_aantal(counts, 'regio'))
+        selected_stad = st.sidebar.multiselect("Stad", facets.get('stad', []), key='restaurant_stad', format_func=met_aantal(counts, 'stad'))
+        prijs_slider = st.sidebar.slider("Prijsniveau (€ - €€€€)", 1, 4, (1, 4), step=1, key='restaurant_prijs')
 
         filtered_restaurants = filter_restaurants_in_memory(
             restaurants_df,
@@ -137,12 +179,12 @@ def main():
             prijs_slider,
             selected_land,
             selected_regio,
-            selected_stad
+            selected_stad,
+            zoekterm
         )
 
         if not filtered_restaurants.empty:
-            for _, row in filtered_restaurants.iterrows():
-                restaurant_kaartje(row)
+            toon_resultaten(filtered_restaurants, restaurant_kaartjes_html, key='restaurants')
         else:
             st.write("Geen restaurants gevonden.")
 
@@ -154,8 +196,42 @@ def main():
             st.stop()
         plan_je_dag_tab(reizen_df, restaurants_df)
 
+def toon_perf_paneel(spans):
+    # Debugpaneel met de timings van deze rerun en de procesbrede histogrammen
+    stats = perf_snapshot()
+    with st.sidebar.expander("⏱️ Prestaties", expanded=False):
+        st.caption("Deze rerun")
+        st.dataframe(spans, hide_index=True)
+        st.caption("Per stage (sinds start van het proces)")
+        st.dataframe([
+            {"stage": name, "aantal": s["count"], "p50 ms": s["p50_ms"], "p95 ms": s["p95_ms"], "gem. ms": s["mean_ms"]}
+            for name, s in sorted(stats["stages"].items())
+        ], hide_index=True)
+        st.caption("Caches")
+        st.dataframe([
+            {"cache": name, **counts} for name, counts in sorted(stats["caches"].items())
+        ], hide_index=True)
+        st.caption("Cachegrootte (resident)")
+        st.dataframe([
+            {"cache": name, "MiB": round(size["bytes"] / 2**20, 2), "items": size["items"]}
+            for name, size in sorted(stats["cache_sizes"].items())
+        ], hide_index=True)
+
+def run():
+    # ?perf=1 zet de instrumentatie aan en toont het debugpaneel, enkel voor
+    # deze rerun; zonder de parameter geldt ZWW_PERF
+    set_enabled(True if st.query_params.get("perf") == "1" else None)
+    start_run()
+    try:
+        with span("rerun"):
+            main()
+    finally:
+        spans = finish_run()
+        if is_enabled():
+            toon_perf_paneel(spans)
+
 if __name__ == "__main__":
-    main()
+    run()
 
 
 
@@ -0,0 +1,439 @@
+"""Benchmark van de hete paden op synthetische data.
+
+Gebruik:
+    python benchmark.py                       # 1k / 10k / 100k rijen
+    python benchmark.py --sizes 1000 10000 --repeat 50 --output bench.json
+    python benchmark.py --save-baseline       # huidige resultaten als baseline bewaren
+
+Zonder --no-compare worden de resultaten vergeleken met benchmark_baseline.json;
+een stage die meer dan --tolerance trager is (p50) geldt als regressie en geeft
+exitcode 1. Elke grootte meet eerst een vaste referentiestap; de baseline wordt
+geschaald met hoe snel die nu loopt, zodat een tragere of drukke machine geen
+valse regressies geeft.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from data_loading import (
+    IncrementalSheet, RESTAURANTS_RANGE, RESTAURANT_SCHEMA, TRAVEL_RANGE, TRAVEL_SCHEMA,
+    parse_restaurants_values, parse_travel_values
+)
+from facets import facet_counts, restaurant_facets, travel_facets
+from filters import (
+    FilterIndex, filter_restaurants_in_memory, filter_travel_in_memory,
+    restaurant_masks, restaurants_index, travel_index, travel_masks
+)
+from geo import RestaurantGeoIndex, route_order
+from gsheets_service import FakeSheetsTransport, batch_get_values, set_sheets_transport
+from kaartweergave import PAGINA_GROOTTE, bestemming_kaartjes_html, restaurant_kaartjes_html
+from pdf_export import create_pdf_from_weekplanning
+from ranking import TravelFeatures, rank_travel_in_memory
+from search import SearchIndex, TRAVEL_SEARCH_FIELDS
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "benchmark_baseline.json")
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+# Vaste referentiestap per grootte, om de baseline op de machinesnelheid te schalen
+REFERENCE_STAGE = "reference"
+
+# --- Synthetische data ---
+TRAVEL_HEADER = [
+    "Land", "Regio", "Stad", "Continent", "Reistype / doel", "Seizoen", "Accommodatie",
+    "Vervoersmiddel", "Minimum duur", "Maximum duur", "Budget", "Temperatuur",
+    "Foto", "URL", "Opmerking", "Naam"
+]
+RESTAURANT_HEADER = [
+    "Naam", "Land", "Regio", "Stad", "Keuken", "Prijs", "Maaltijd", "Foto", "URL", "Opmerking"
+]
+CONTINENTEN = {
+    "Europa": ["Italië", "Spanje", "Frankrijk", "Portugal", "Griekenland", "Kroatië", "Noorwegen", "Schotland"],
+    "Azië": ["Japan", "Thailand", "Vietnam", "Indonesië", "India"],
+    "Noord-Amerika": ["Verenigde Staten", "Canada", "Mexico"],
+    "Zuid-Amerika": ["Peru", "Argentinië", "Chili"],
+    "Afrika": ["Marokko", "Zuid-Afrika", "Tanzania"],
+    "Oceanië": ["Australië", "Nieuw-Zeeland"],
+}
+REISTYPES = ["Stedentrip", "Strandvakantie", "Rondreis", "Wintersport", "Natuur", "Cultuur", "Roadtrip"]
+SEIZOENEN = ["Lente", "Zomer", "Herfst", "Winter"]
+ACCOMMODATIES = ["Hotel", "Appartement", "Camping", "B&B", "Hostel", ""]
+VERVOERSMIDDELEN = ["Vliegtuig", "Trein", "Auto", "Bus", "Boot", "Fiets"]
+KEUKENS = ["Italiaans", "Frans", "Japans", "Thais", "Mexicaans", "Vegetarisch", "Grill", "Vis", "Tapas", "Indisch"]
+MAALTIJDEN = ["Ontbijt", "Lunch", "Diner"]
+WOORDEN = ["rustig", "druk", "authentiek", "romantisch", "kindvriendelijk", "verborgen parel", "uitzicht", "budget", "luxe"]
+
+
+def _geografie(rng, regios_per_land=6, steden_per_regio=8):
+    # land -> regio -> steden, vast per seed
+    geo = []
+    for continent, landen in CONTINENTEN.items():
+        for land in landen:
+            for r in range(regios_per_land):
+                regio = f"{land} regio {r + 1}"
+                for s in range(steden_per_regio):
+                    geo.append((continent, land, regio, f"{regio.split(' ')[0]}stad {r + 1}-{s + 1}"))
+    rng.shuffle(geo)
+    return geo
+
+
+def _subset(rng, values, k_max):
+    return ";".join(rng.sample(values, rng.randint(1, k_max)))
+
+
+def generate_travel_values(n, seed=0):
+    rng = random.Random(seed)
+    geo = _geografie(rng)
+    values = [list(TRAVEL_HEADER)]
+    for i in range(n):
+        continent, land, regio, stad = geo[rng.randrange(len(geo))]
+        min_duur = rng.randint(1, 10)
+        row = [
+            land, regio, stad, continent,
+            rng.choice(REISTYPES),
+            _subset(rng, SEIZOENEN, 3),
+            rng.choice(ACCOMMODATIES),
+            _subset(rng, VERVOERSMIDDELEN, 3),
+            str(min_duur), str(min_duur + rng.randint(0, 21)),
+            str(rng.randint(2, 80) * 50),
+            str(rng.randint(-5, 38)),
+            f"https://example.org/foto/{i}.jpg" if rng.random() < 0.8 else "",
+            f"https://example.org/reis/{i}" if rng.random() < 0.5 else "",
+            " ".join(rng.sample(WOORDEN, 2)),
+            f"{stad} {rng.choice(REISTYPES).lower()}",
+        ]
+        # Net als de Sheets API: lege cellen achteraan worden weggelaten
+        while row and row[-1] == "":
+            row.pop()
+        values.append(row)
+    return values
+
+
+def generate_restaurant_values(n, seed=0):
+    rng = random.Random(seed + 1)
+    geo = _geografie(random.Random(seed))
+    values = [list(RESTAURANT_HEADER)]
+    for i in range(n):
+        _, land, regio, stad = geo[rng.randrange(len(geo))]
+        keuken = rng.choice(KEUKENS)
+        row = [
+            f"{keuken} {rng.choice(['Huis', 'Bistro', 'Kantine', 'Trattoria', 'Bar'])} {i}",
+            land, regio, stad, keuken,
+            str(rng.randint(1, 4)),
+            _subset(rng, MAALTIJDEN, 3),
+            f"https://example.org/resto/{i}.jpg" if rng.random() < 0.7 else "",
+            f"https://example.org/r/{i}" if rng.random() < 0.5 else "",
+            rng.choice(WOORDEN),
+        ]
+        values.append(row)
+    return values
+
+
+def fake_transport(n_travel, n_restaurants, seed=0):
+    return FakeSheetsTransport({
+        TRAVEL_RANGE.split('!')[0]: generate_travel_values(n_travel, seed),
+        RESTAURANTS_RANGE.split('!')[0]: generate_restaurant_values(n_restaurants, seed),
+    })
+
+
+# --- Queries ---
+def _travel_query(rng, df):
+    facets = travel_facets(df)
+    low_d, high_d = facets['duur']
+    low_b, high_b = facets['budget']
+    low_t, high_t = facets['temperatuur']
+
+    def kies(col, k=2):
+        return rng.sample(facets[col], rng.randint(0, min(k, len(facets[col]))))
+
+    return (
+        (rng.randint(low_d, (low_d + high_d) // 2), rng.randint((low_d + high_d) // 2, high_d)),
+        (rng.randint(low_b, (low_b + high_b) // 2), rng.randint((low_b + high_b) // 2, high_b)),
+        kies('continent'), kies('reistype / doel'), kies('seizoen'), kies('accommodatie'),
+        (rng.randint(low_t, (low_t + high_t) // 2), rng.randint((low_t + high_t) // 2, high_t)),
+        kies('vervoersmiddel'), kies('land', 3), [], [],
+    )
+
+
+def _restaurant_query(rng, df):
+    facets = restaurant_facets(df)
+    low = rng.randint(1, 2)
+    return (
+        rng.sample(facets['keuken'], rng.randint(0, 3)),
+        (low, rng.randint(low, 4)),
+        rng.sample(facets['land'], rng.randint(0, 2)),
+        [], [],
+    )
+
+
+def _search_query(rng, travel_df):
+    # Een plaatsnaam met een wisselfout en een (begin van een) opmerkingswoord
+    stad = str(travel_df['stad'].iloc[rng.randrange(len(travel_df))])
+    i = rng.randrange(len(stad) - 1)
+    typo = stad[:i] + stad[i + 1] + stad[i] + stad[i + 2:]
+    woord = (str(travel_df['opmerking'].iloc[rng.randrange(len(travel_df))]).split() or [stad])[0]
+    return f"{typo} {woord[:rng.randint(min(3, len(woord)), len(woord))]}"
+
+
+def _weekplanning(rng, travel_df, restaurants_df, dagen):
+    steden = travel_df['stad'].astype(str).tolist()
+    namen = restaurants_df['naam'].tolist()
+    return [
+        {
+            "bestemming": rng.choice(steden),
+            "ontbijt": rng.choice(namen),
+            "lunch": rng.choice(namen + [None]),
+            "diner": rng.choice(namen),
+        }
+        for _ in range(dagen)
+    ]
+
+
+# --- Meten ---
+def _measure(fn, repeat):
+    # Latenties in ms na één opwarmrun (lazy imports, gazetteer, ...); daarna
+    # één extra run onder tracemalloc voor de piek
+    fn()
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    latencies.sort()
+    return {
+        "runs": repeat,
+        "p50_ms": round(statistics.median(latencies), 4),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 4),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 4),
+        "max_ms": round(latencies[-1], 4),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def _reference_work():
+    # Vaste mix van Python-, numpy- en pandaswerk, los van de code van de app:
+    # maat voor de snelheid van de machine op dat moment
+    values = np.random.default_rng(0).integers(0, 1000, 200_000)
+    frame = pd.DataFrame({'k': values % 97, 'v': values})
+    frame.groupby('k')['v'].sum()
+    np.sort(values)
+    sum(i * i for i in range(100_000))
+    ",".join(str(v) for v in values[:20_000].tolist()).split(",")
+
+
+def bench_size(n, repeat, seed=0):
+    rng = random.Random(seed)
+    n_restaurants = n
+    transport = fake_transport(n, n_restaurants, seed)
+    set_sheets_transport(transport)
+    results = {REFERENCE_STAGE: _measure(_reference_work, max(5, repeat // 3))}
+
+    def load():
+        values = batch_get_values([TRAVEL_RANGE, RESTAURANTS_RANGE])
+        travel = IncrementalSheet(parse_travel_values, TRAVEL_SCHEMA).update(values[0])
+        restaurants = IncrementalSheet(parse_restaurants_values, RESTAURANT_SCHEMA).update(values[1])
+        return travel, restaurants
+
+    load_repeat = max(3, repeat // 10)
+    results["load_parse"] = _measure(load, load_repeat)
+    travel_df, restaurants_df = load()
+
+    # Incrementele refresh met 1% gewijzigde rijen
+    sheet = IncrementalSheet(parse_travel_values, TRAVEL_SCHEMA)
+    base_values = generate_travel_values(n, seed)
+    sheet.update([list(r) for r in base_values])
+    changed = [list(r) for r in base_values]
+    for i in rng.sample(range(1, len(changed)), max(1, n // 100)):
+        changed[i] = changed[i][:10] + [str(rng.randint(2, 80) * 50)] + changed[i][11:]
+    versions = [base_values, changed]
+    toggle = [0]
+
+    def refresh():
+        toggle[0] ^= 1
+        sheet.update([list(r) for r in versions[toggle[0]]])
+
+    results["incremental_refresh"] = _measure(refresh, load_repeat)
+
+    results["travel_index_build"] = _measure(
+        lambda: FilterIndex(
+            travel_df,
+            categorical=['continent', 'reistype / doel', 'accommodatie', 'land', 'regio', 'stad'],
+            tokens=['seizoen', 'vervoersmiddel'],
+            ranges=['minimum duur', 'maximum duur', 'budget', 'temperatuur']
+        ),
+        load_repeat
+    )
+
+    travel_queries = [_travel_query(rng, travel_df) for _ in range(repeat)]
+    restaurant_queries = [_restaurant_query(rng, restaurants_df) for _ in range(repeat)]
+    it_travel = iter(travel_queries * 2)
+    it_restaurants = iter(restaurant_queries * 2)
+    results["filter_travel"] = _measure(lambda: filter_travel_in_memory(travel_df, *next(it_travel)), repeat)
+    results["filter_restaurants"] = _measure(lambda: filter_restaurants_in_memory(restaurants_df, *next(it_restaurants)), repeat)
+
+    it_travel = iter(travel_queries * 2)
+    it_restaurants = iter(restaurant_queries * 2)
+
+    def travel_options():
+        index = travel_index(travel_df)
+        travel_facets(travel_df)
+        facet_counts(index, travel_masks(index, *next(it_travel)))
+
+    def restaurant_options():
+        index = restaurants_index(restaurants_df)
+        restaurant_facets(restaurants_df)
+        facet_counts(index, restaurant_masks(index, *next(it_restaurants)))
+
+    results["options_travel"] = _measure(travel_options, repeat)
+    results["options_restaurants"] = _measure(restaurant_options, repeat)
+
+    results["ranking_features_build"] = _measure(lambda: TravelFeatures(travel_df), load_repeat)
+    it_travel = iter(travel_queries * 2)
+    results["rank_travel"] = _measure(lambda: rank_travel_in_memory(travel_df, *next(it_travel)), repeat)
+
+    results["search_index_build"] = _measure(lambda: SearchIndex(travel_df, TRAVEL_SEARCH_FIELDS), max(3, load_repeat // 3))
+    search_index = SearchIndex(travel_df, TRAVEL_SEARCH_FIELDS)
+    it_search = iter([_search_query(rng, travel_df) for _ in range(repeat)] * 2)
+    results["search_travel"] = _measure(lambda: search_index.scores(next(it_search)), repeat)
+
+    results["geo_index_build"] = _measure(lambda: RestaurantGeoIndex(restaurants_df), max(3, load_repeat // 3))
+    geo_index = RestaurantGeoIndex(restaurants_df)
+    plaatsen = travel_df[['lat', 'lon']].dropna().to_numpy()
+    it_plaatsen = iter([plaatsen[rng.randrange(len(plaatsen))] for _ in range(repeat)] * 2)
+    results["nearest_restaurants"] = _measure(lambda: geo_index.nearest(*next(it_plaatsen), maaltijd='diner', k=25), repeat)
+    stops = [plaatsen[rng.randrange(len(plaatsen))] for _ in range(14)]
+    results["route_two_weeks"] = _measure(lambda: route_order(stops), repeat)
+
+    pagina_reizen = travel_df.iloc[:PAGINA_GROOTTE]
+    pagina_restaurants = restaurants_df.iloc[:PAGINA_GROOTTE]
+    results["card_html_travel_page"] = _measure(lambda: bestemming_kaartjes_html(pagina_reizen, {}), repeat)
+    results["card_html_restaurants_page"] = _measure(lambda: restaurant_kaartjes_html(pagina_restaurants, {}), repeat)
+
+    week = _weekplanning(rng, travel_df, restaurants_df, 7)
+    results["pdf_week"] = _measure(lambda: create_pdf_from_weekplanning(week), max(3, repeat // 5))
+
+    # Referentie ook na afloop, tegen schommelingen tijdens de run
+    after = _measure(_reference_work, max(5, repeat // 3))
+    reference = results[REFERENCE_STAGE]
+    for key in ("p50_ms", "p95_ms", "p99_ms"):
+        reference[key] = round((reference[key] + after[key]) / 2, 4)
+    reference["max_ms"] = max(reference["max_ms"], after["max_ms"])
+    reference["runs"] += after["runs"]
+
+    set_sheets_transport(None)
+    return results
+
+
+def machine_factor(stages, base_stages):
+    # Hoeveel trager (> 1) of sneller de referentiestap nu loopt dan bij de baseline
+    now, base = stages.get(REFERENCE_STAGE), base_stages.get(REFERENCE_STAGE)
+    if not now or not base or base["p50_ms"] <= 0:
+        return 1.0
+    return now["p50_ms"] / base["p50_ms"]
+
+
+def compare(current, baseline, tolerance, min_delta_ms=0.0):
+    # Regressies: stages waarvan de p50 meer dan `tolerance` (en minstens
+    # min_delta_ms) trager is dan de baseline, geschaald met de machinefactor
+    # van dezelfde run
+    regressions = []
+    for size, stages in current["results"].items():
+        base_stages = baseline.get("results", {}).get(size, {})
+        factor = machine_factor(stages, base_stages)
+        current.setdefault("machine_factor", {})[size] = round(factor, 3)
+        for stage, stats in stages.items():
+            base = base_stages.get(stage)
+            if stage == REFERENCE_STAGE or not base or base["p50_ms"] <= 0:
+                continue
+            expected = base["p50_ms"] * factor
+            ratio = stats["p50_ms"] / expected
+            stats["baseline_p50_ms"] = base["p50_ms"]
+            stats["ratio"] = round(ratio, 3)
+            if ratio > 1 + tolerance and stats["p50_ms"] - expected > min_delta_ms:
+                regressions.append((size, stage, expected, stats["p50_ms"], ratio))
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark van laden, filteren, facetten, kaartjes en PDF-export.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON-resultaten naar dit bestand schrijven")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--no-compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    # Verschillen van een fractie van een milliseconde zijn meetruis
+    parser.add_argument("--min-delta-ms", type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or None,
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "commit": _git_commit(),
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "results": {},
+    }
+    for n in args.sizes:
+        print(f"== {n} rijen", file=sys.stderr)
+        report["results"][str(n)] = bench_size(n, args.repeat, args.seed)
+        for stage, stats in report["results"][str(n)].items():
+            print(f"  {stage:<28} p50 {stats['p50_ms']:>10.3f} ms  p95 {stats['p95_ms']:>10.3f} ms  piek {stats['peak_kib']:>10.1f} KiB", file=sys.stderr)
+
+    regressions = []
+    if not args.no_compare and not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance, args.min_delta_ms)
+        for size, stage, base, now, ratio in regressions:
+            print(f"REGRESSIE {size} {stage}: {base:.3f} -> {now:.3f} ms (x{ratio:.2f}, baseline geschaald x{report['machine_factor'][size]:.2f})", file=sys.stderr)
+    report["regressions"] = [
+        {"size": size, "stage": stage, "expected_p50_ms": round(base, 4), "p50_ms": now}
+        for size, stage, base, now, _ in regressions
+    ]
+
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload + "\n")
+    else:
+        print(payload)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            f.write(payload + "\n")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,27 +1,38 @@
 import streamlit as st
 import pandas as pd
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-import requests
-import base64
+import functools
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import weakref
 
-from gsheets_service import get_gsheets_service
+from gazetteer import add_coordinates
+from gsheets_service import batch_get_values
+from instrumentation import record_cache, register_cache_size, span
+from snapshot import read_snapshot, write_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Met ZWW_OFFLINE=1 wordt Google Sheets nooit gecontacteerd, enkel de snapshot gebruikt
+OFFLINE = os.environ.get("ZWW_OFFLINE") == "1"
+
+# Na zoveel seconden worden de sheets opnieuw opgehaald, op de achtergrond
+# al na REFRESH_AHEAD van die tijd. Na een fout eerst REFRESH_BACKOFF seconden
+# wachten, bij elke volgende fout dubbel zo lang (tot REFRESH_BACKOFF_MAX).
+DATA_TTL = int(os.environ.get("ZWW_DATA_TTL", 600))
+REFRESH_AHEAD = 0.9
+REFRESH_BACKOFF = 15
+REFRESH_BACKOFF_MAX = 600
 
 # --- Cached data loading ---
-@st.cache_data(ttl=600)
-def load_travel_data():
-    service = get_gsheets_service()
-    spreadsheet_id = st.secrets["spreadsheet_id"]
-    sheet = service.spreadsheets()
-    try:
-        result = sheet.values().get(spreadsheetId=spreadsheet_id, range="Opties!A1:P").execute()
-        values = result.get('values', [])
-    except Exception as e:
-        st.error(f"Error bij ophalen data van Google Sheets: {e}")
-        return pd.DataFrame()
-    if not values:
-        st.error("Geen data gevonden in Google Sheet.")
-        return pd.DataFrame()
+TRAVEL_RANGE = "Opties!A1:P"
+RESTAURANTS_RANGE = "Restaurants!A1:J"
+
+
+def values_to_dataframe(values):
     cols = values[0]
     data = values[1:]
     for row in data:
@@ -29,41 +40,454 @@ def load_travel_data():
             row += [''] * (len(cols) - len(row))
     df = pd.DataFrame(data, columns=cols)
     df.columns = df.columns.str.strip().str.lower()
-    for col in ['minimum duur', 'maximum duur', 'budget', 'temperatuur']:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
     return df
 
-@st.cache_data(ttl=600)
-def load_restaurants_data():
-    service = get_gsheets_service()
-    spreadsheet_id = st.secrets["spreadsheet_id"]
-    sheet = service.spreadsheets()
-    try:
-        result = sheet.values().get(spreadsheetId=spreadsheet_id, range="Restaurants!A1:J").execute()
-        values = result.get('values', [])
-    except Exception as e:
-        st.error(f"Error bij ophalen restaurantdata: {e}")
-        return pd.DataFrame()
-    if not values:
-        st.error("Geen data gevonden in Restaurants-sheet.")
-        return pd.DataFrame()
-    cols = values[0]
-    data = values[1:]
-    for row in data:
-        if len(row) < len(cols):
-            row += [''] * (len(cols) - len(row))
-    df = pd.DataFrame(data, columns=cols)
-    df.columns = df.columns.str.strip().str.lower()
+
+# --- Schema ---
+# Eén normalisatiestap bij het laden: numerieke kolommen als float, vaste
+# keuzelijsten als category, lege tekst als '' en de ;-gescheiden kolommen
+# vooraf gesplitst in tuples (kolom '<naam>_lijst'). Met 'geo' komen er
+# coördinaten bij (kolommen lat/lon, zie gazetteer.py).
+TRAVEL_SCHEMA = {
+    'numeric': ['minimum duur', 'maximum duur', 'budget', 'temperatuur', 'lat', 'lon'],
+    'category': ['land', 'regio', 'stad', 'continent'],
+    'lists': ['seizoen', 'vervoersmiddel'],
+    'geo': True,
+}
+RESTAURANT_SCHEMA = {
+    'numeric': ['prijs', 'lat', 'lon'],
+    'category': ['land', 'regio', 'stad', 'keuken'],
+    'lists': ['maaltijd'],
+    'geo': True,
+}
+
+
+def list_column(col):
+    return f"{col}_lijst"
+
+
+def split_values(value):
+    return tuple(v.strip() for v in str(value).split(';') if v.strip())
+
+
+def normalize_frame(df, schema):
+    # Idempotent: kolommen die al het juiste type hebben worden overgeslagen,
+    # zodat dit ook na een incrementele patch of een snapshot goedkoop is.
+    list_cols = {list_column(col) for col in schema['lists']}
+    for col in df.columns:
+        if col in list_cols:
+            continue
+        if col in schema['numeric']:
+            if df[col].dtype != 'float64':
+                df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+        elif col in schema['category']:
+            if not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].fillna('').astype('category')
+        elif df[col].hasnans:
+            df[col] = df[col].fillna('')
+    for col in schema['lists']:
+        if col in df.columns and list_column(col) not in df.columns:
+            df[list_column(col)] = df[col].map(split_values).astype(object)
+    if schema.get('geo'):
+        # Eén keer geocoderen bij het laden; lat/lon gaan mee in de snapshot
+        add_coordinates(df)
     return df
 
-@st.cache_data(ttl=600)
-def image_to_base64_cached(image_url):
+
+# Een cel als "Ontbijt en lunch" telt voor beide maaltijden (deel van de
+# tekst, zoals str.contains), naast de exacte ;-waarden zelf
+MEALS = ("ontbijt", "lunch", "diner")
+
+
+def meal_keys(values):
+    keys = {" ".join(str(v).split()).casefold() for v in values}
+    text = " ".join(keys)
+    keys.update(meal for meal in MEALS if meal in text)
+    keys.discard('')
+    return keys
+
+
+def format_number(value):
+    # Numerieke kolommen zijn float64; voor weergave zonder ".0" of
+    # wetenschappelijke notatie (1500000, niet 1.5e+06)
+    if value is None or pd.isna(value):
+        return ''
+    value = float(value)
+    return f"{value:.0f}" if value.is_integer() else f"{value:.2f}".rstrip('0')
+
+
+def parse_travel_values(values):
+    return normalize_frame(values_to_dataframe(values), TRAVEL_SCHEMA)
+
+
+def parse_restaurants_values(values):
+    return normalize_frame(values_to_dataframe(values), RESTAURANT_SCHEMA)
+
+
+def values_hash(values):
+    # Stabiele hash van de ruwe sheetinhoud; dient als goedkoop wijzigingssignaal
+    # en als dataversie (de values-API kent geen revisienummer).
+    payload = json.dumps(values, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def data_version(df):
+    return df.attrs.get('data_version')
+
+
+def per_data_version(fn=None, maxsize=4):
+    # Memoiseert fn(df, *args) per dataversie van df, zodat afgeleide structuren
+    # (indexen, facetten, ...) één keer per geladen versie opgebouwd worden.
+    # Gefilterde frames erven de attrs, daarom hoort het item bij precies dit
+    # frame-object (zwakke referentie): een deelselectie krijgt nooit de index
+    # van een ander frame, en een item verdwijnt samen met zijn frame.
+    if fn is None:
+        return functools.partial(per_data_version, maxsize=maxsize)
+    cache = {}
+    lock = threading.Lock()
+
+    @functools.wraps(fn)
+    def wrapper(df, *args):
+        version = data_version(df)
+        if version is None:
+            return fn(df, *args)
+        key = (version, id(df)) + args
+        with lock:
+            entry = cache.get(key)
+        if entry is not None and entry[0]() is df:
+            record_cache(fn.__name__, True)
+            return entry[1]
+        record_cache(fn.__name__, False)
+        value = fn(df, *args)
+        # Zonder lock: de callback kan tijdens garbage collection in eender welke thread lopen
+        ref = weakref.ref(df, lambda _, key=key: cache.pop(key, None))
+        with lock:
+            cache[key] = (ref, value)
+            while len(cache) > maxsize:
+                cache.pop(next(iter(cache)), None)
+        return value
+
+    wrapper.cache_clear = cache.clear
+    return wrapper
+
+
+def read_only(array):
+    # Afgeleide structuren worden door alle sessies gedeeld en mogen niet wijzigen
+    array.flags.writeable = False
+    return array
+
+
+# --- Incrementele refresh ---
+class IncrementalSheet:
+    # Houdt de laatst geparste versie van één tabblad bij. Bij een refresh wordt
+    # alleen opnieuw geparsed wat echt veranderd is.
+    def __init__(self, parse, schema):
+        self.parse = parse
+        self.schema = schema
+        self.version = None
+        self.header = None
+        self.rows = []
+        self.df = None
+        self._lock = threading.Lock()
+
+    def seed(self, df):
+        # Startwaarde uit de snapshot; de ruwe rijen zijn onbekend, dus de
+        # eerstvolgende wijziging wordt volledig geparsed.
+        with self._lock:
+            if self.df is None:
+                self.version = df.attrs.get('data_version')
+                self.df = normalize_frame(df, self.schema)
+
+    def update(self, values):
+        version = values_hash(values)
+        with self._lock:
+            if version == self.version:
+                return self.df
+            header = tuple(values[0])
+            rows = [tuple(row) for row in values[1:]]
+            with span("parse_normalize", rows=len(rows)) as s:
+                if self.df is None or header != self.header:
+                    s.set(mode="full")
+                    df = self.parse(values)
+                else:
+                    s.set(mode="patch")
+                    df = self._patch(header, rows)
+            df.attrs['data_version'] = version
+            self.version, self.header, self.rows, self.df = version, header, rows, df
+            return df
+
+    def _patch(self, header, rows):
+        # Ongewijzigde rijen (ook als ze verschoven zijn) worden uit het vorige
+        # frame overgenomen; enkel nieuwe of aangepaste rijen worden geparsed.
+        old_positions = {}
+        for i, row in enumerate(self.rows):
+            old_positions.setdefault(row, i)
+
+        kept_new, kept_old, changed = [], [], []
+        for i, row in enumerate(rows):
+            j = old_positions.get(row)
+            if j is None:
+                changed.append(i)
+            else:
+                kept_new.append(i)
+                kept_old.append(j)
+
+        kept = self.df.take(kept_old)
+        kept.index = kept_new
+        if not changed:
+            return kept
+
+        patch = self.parse([list(header)] + [list(rows[i]) for i in changed])
+        patch.index = changed
+        if not kept_new:
+            return patch
+        # Categorieën van beide delen kunnen verschillen; opnieuw normaliseren
+        return normalize_frame(pd.concat([kept, patch]).sort_index(), self.schema)
+
+
+_travel_sheet = IncrementalSheet(parse_travel_values, TRAVEL_SCHEMA)
+_restaurants_sheet = IncrementalSheet(parse_restaurants_values, RESTAURANT_SCHEMA)
+SHEETS = {
+    "reizen": (TRAVEL_RANGE, _travel_sheet),
+    "restaurants": (RESTAURANTS_RANGE, _restaurants_sheet),
+}
+EMPTY_SHEET_MESSAGES = {
+    "reizen": "Geen data gevonden in Google Sheet.",
+    "restaurants": "Geen data gevonden in Restaurants-sheet.",
+}
+_snapshot_versions = {}
+
+
+def current_frames():
+    return tuple(
+        sheet.df if sheet.df is not None else pd.DataFrame()
+        for _, sheet in SHEETS.values()
+    )
+
+
+def _seed_from_snapshot():
+    seeded = False
+    for name, (_, sheet) in SHEETS.items():
+        df = read_snapshot(name)
+        if df is not None:
+            sheet.seed(df)
+            _snapshot_versions[name] = df.attrs.get('data_version')
+            seeded = True
+    return seeded
+
+
+def _write_snapshots():
+    for name, (_, sheet) in SHEETS.items():
+        if sheet.df is not None and _snapshot_versions.get(name) != sheet.version:
+            # De tuple-kolommen worden bij het inlezen opnieuw afgeleid
+            list_cols = [list_column(col) for col in sheet.schema['lists']]
+            write_snapshot(name, sheet.df.drop(columns=list_cols, errors='ignore'))
+            _snapshot_versions[name] = sheet.version
+
+
+def _fetch_sheet_values():
+    # Beide tabbladen in één batchGet-request
+    with span("sheets_fetch") as s:
+        values = dict(zip(SHEETS, batch_get_values([r for r, _ in SHEETS.values()])))
+        s.set(rows=sum(len(v) for v in values.values()))
+    return values
+
+
+def _log_report(level, message):
+    getattr(logger, level)(message)
+
+
+def refresh_data(report=_log_report):
+    # Laadt of ververst beide tabbladen, zonder Streamlit: meldingen gaan naar
+    # report(niveau, tekst) met niveau 'warning' of 'error'. Geeft (frames, status):
+    # 'synced' na een gelukte ophaling, 'snapshot' als er enkel de snapshot
+    # is en 'failed' als Google Sheets niet bereikbaar was.
+    cold_start = all(sheet.df is None for _, sheet in SHEETS.values())
+    if cold_start and _seed_from_snapshot():
+        # Meteen de snapshot tonen; SharedDataStore revalideert op de achtergrond
+        return current_frames(), 'synced' if OFFLINE else 'snapshot'
+    if OFFLINE:
+        if cold_start:
+            report("error", "Geen lokale snapshot beschikbaar voor offline gebruik.")
+        return current_frames(), 'synced'
+
     try:
-        response = requests.get(image_url)
-        response.raise_for_status()
-        img_bytes = response.content
-        encoded = base64.b64encode(img_bytes).decode()
-        return f"data:image/jpeg;base64,{encoded}"
-    except Exception:
-        return None
+        values = _fetch_sheet_values()
+    except Exception as e:
+        if not cold_start:
+            report("warning", f"Google Sheets niet bereikbaar, laatst bekende data wordt getoond: {e}")
+        else:
+            report("error", f"Error bij ophalen data van Google Sheets: {e}")
+        return current_frames(), 'failed'
+
+    for name, (_, sheet) in SHEETS.items():
+        if values[name]:
+            sheet.update(values[name])
+        else:
+            # Een leeg antwoord vervangt nooit de laatst bekende data
+            report("error", EMPTY_SHEET_MESSAGES[name])
+    _write_snapshots()
+    return current_frames(), 'synced'
+
+
+def _st_report(level, message):
+    getattr(st, level)(message)
+
+
+# --- Gedeelde data ---
+class SharedDataStore:
+    # Eén set frames per proces, gedeeld door alle sessies zonder pickle of
+    # kopie (st.cache_data kopieert bij elke toegang). Een gepubliceerd frame
+    # wordt nooit meer in place aangepast: een refresh bouwt een nieuw frame en
+    # sessies lezen enkel; afgeleide arrays zijn alleen-lezen (read_only).
+    # Stale-while-revalidate: enkel de allereerste lading blokkeert. Daarna
+    # ververst een achtergrondthread de data vóór ze verloopt en krijgt elke
+    # request meteen de laatst goede versie. Er loopt hooguit één verversing
+    # tegelijk; na een fout wordt exponentieel langer gewacht en blijft de
+    # vorige data staan.
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.frames = None
+        self.loaded_at = None
+        self.failures = 0
+        self.retry_at = 0.0
+        self.last_error = None
+        self._load_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._refreshing = False
+        self._refresher = None
+        self._wakeup = threading.Event()
+
+    def expired(self):
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > self.ttl
+
+    def get(self, report=_log_report):
+        self.start()
+        frames = self.frames
+        if frames is not None:
+            fresh = not self.expired()
+            record_cache("load_all_data", fresh)
+            if not fresh:
+                self.refresh_async()
+            return frames
+        # Koude start: gelijktijdige requests wachten op dezelfde lading
+        with self._load_lock:
+            hit = self.frames is not None
+            if not hit:
+                with self._state_lock:
+                    self._refreshing = True
+                try:
+                    self._apply(*refresh_data(report))
+                finally:
+                    with self._state_lock:
+                        self._refreshing = False
+            record_cache("load_all_data", hit)
+            return self.frames
+
+    def refresh_async(self, force=False):
+        # Start een verversing in een aparte thread en geeft meteen terug;
+        # force negeert de wachttijd na een fout (de 🔄-knop)
+        if self._begin(force):
+            threading.Thread(target=self._refresh, name="data-refresh", daemon=True).start()
+            return True
+        return False
+
+    def clear(self):
+        return self.refresh_async(force=True)
+
+    def start(self):
+        if self._refresher is not None or OFFLINE:
+            return
+        with self._state_lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(target=self._run, name="data-refresher", daemon=True)
+                self._refresher.start()
+
+    def _begin(self, force):
+        with self._state_lock:
+            if self._refreshing or (not force and time.monotonic() < self.retry_at):
+                return False
+            self._refreshing = True
+            return True
+
+    def _refresh(self):
+        try:
+            self.last_error = None
+            with span("background_refresh"):
+                frames, status = refresh_data(self._background_report)
+            self._apply(frames, status)
+        except Exception as e:
+            logger.exception("Verversen van de data mislukt")
+            self._apply(self.frames, 'failed')
+            self.last_error = f"Verversen van de data mislukt: {e}"
+        finally:
+            with self._state_lock:
+                self._refreshing = False
+
+    def _background_report(self, level, message):
+        # Geen Streamlit in een achtergrondthread: loggen en bewaren voor de app
+        _log_report(level, message)
+        self.last_error = message
+
+    def _apply(self, frames, status):
+        with self._state_lock:
+            if self.frames is not None:
+                # Een lege tabel vervangt nooit de laatst goede data
+                frames = tuple(old if new.empty and not old.empty else new for old, new in zip(self.frames, frames))
+            self.frames = frames
+            now = time.monotonic()
+            if status == 'synced':
+                self.loaded_at = now
+                self.failures = 0
+                self.retry_at = 0.0
+            elif status == 'failed':
+                self.failures += 1
+                self.retry_at = now + min(REFRESH_BACKOFF_MAX, REFRESH_BACKOFF * 2 ** (self.failures - 1))
+        self._wakeup.set()
+
+    def _next_refresh(self):
+        # Seconden tot de volgende geplande verversing; None = wachten op de eerste lading
+        if self.frames is None:
+            return None
+        now = time.monotonic()
+        due = self.retry_at if self.loaded_at is None else self.loaded_at + self.ttl * REFRESH_AHEAD
+        return max(max(due, self.retry_at) - now, 1.0)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self._next_refresh())
+            self._wakeup.clear()
+            if self.frames is not None and self._next_refresh() <= 1.0 and self._begin(False):
+                self._refresh()
+
+
+shared_data = SharedDataStore(DATA_TTL)
+
+
+def load_all_data():
+    return shared_data.get(_st_report)
+
+
+load_all_data.clear = shared_data.clear
+
+
+def load_travel_data():
+    return load_all_data()[0]
+
+
+def load_restaurants_data():
+    return load_all_data()[1]
+
+
+@per_data_version
+def frame_nbytes(df):
+    # Resident geheugen van een frame (met de inhoud van tekstkolommen), één keer per versie
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def _frames_size():
+    frames = [df for df in (shared_data.frames or ()) if not df.empty]
+    return sum(frame_nbytes(df) for df in frames), len(frames)
+
+
+register_cache_size("frames", _frames_size)
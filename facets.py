@@ -0,0 +1,75 @@
+import numpy as np
+
+from data_loading import per_data_version
+from filters import combine_masks, restaurants_index, travel_index
+from instrumentation import span
+
+
+# --- Facetten ---
+# Keuzelijsten en sliderbereiken worden één keer per dataversie berekend; de
+# aantallen per optie komen rechtstreeks uit de filterindex.
+def _options(index):
+    options = {col: sorted(k for k in postings if k) for col, postings in index.postings.items()}
+    for col, labels in index.token_labels.items():
+        options[col] = sorted(labels.values())
+    return options
+
+
+def _bounds(index, col, default):
+    if col not in index.sorted_ranges or len(index.sorted_ranges[col][0]) == 0:
+        return default
+    values = index.sorted_ranges[col][0]
+    return int(values[0]), int(values[-1])
+
+
+@per_data_version
+def travel_facets(df):
+    index = travel_index(df)
+    facets = _options(index)
+    facets['duur'] = (
+        _bounds(index, 'minimum duur', (0, 0))[0],
+        _bounds(index, 'maximum duur', (0, 0))[1]
+    )
+    facets['budget'] = _bounds(index, 'budget', (0, 0))
+    facets['temperatuur'] = _bounds(index, 'temperatuur', (0, 40))
+    return facets
+
+
+@per_data_version
+def restaurant_facets(df):
+    return _options(restaurants_index(df))
+
+
+def facet_counts(index, masks):
+    # Per optie: hoeveel rijen overblijven als die optie (ook) gekozen wordt,
+    # gegeven alle andere filters. Eén pass over de postings per kolom.
+    with span("facet_counts", rows=index.size):
+        return _facet_counts(index, masks)
+
+
+def _facet_counts(index, masks):
+    counts = {}
+    for col in list(index.postings) + list(index.token_postings):
+        if col not in masks:
+            continue
+        others = combine_masks(index, [m for name, m in masks.items() if name != col])
+        if col in index.postings:
+            counts[col] = {
+                key: int(np.count_nonzero(others[rows]))
+                for key, rows in index.postings[col].items()
+            }
+        else:
+            labels = index.token_labels[col]
+            counts[col] = {
+                labels[key]: int(np.count_nonzero(others[rows]))
+                for key, rows in index.token_postings[col].items()
+            }
+    return counts
+
+
+def clamp_range(value, bounds):
+    # Sliderwaarde uit een vorige run binnen het bereik van de huidige data houden
+    if not value:
+        return bounds
+    low, high = bounds
+    return max(low, min(value[0], high)), max(low, min(value[1], high))
@@ -1,64 +1,184 @@
+import numpy as np
 import pandas as pd
 
+from data_loading import list_column, per_data_version, read_only
+from instrumentation import span
+from search import rank_rows, restaurants_search_index, search_scores, travel_search_index
+
+
+# --- Filterindex ---
+class FilterIndex:
+    # Eén keer per dataversie opgebouwd. Per waarde van een keuzekolom (en per
+    # token van een ;-kolom) een gesorteerde lijst rijposities, per numerieke
+    # kolom de gesorteerde waarden. Een filter wordt zo een paar
+    # rij-masks die met & gecombineerd worden.
+    def __init__(self, df, categorical=(), tokens=(), ranges=()):
+        self.size = len(df)
+        self.postings = {}
+        self.token_postings = {}
+        self.token_labels = {}
+        self.sorted_ranges = {}
+
+        for col in categorical:
+            if col in df.columns:
+                keys = df[col].astype(object).to_numpy()
+                self.postings[col] = _build_postings(keys, np.arange(self.size))
+
+        for col in tokens:
+            lists = list_column(col)
+            if lists in df.columns:
+                lengths = df[lists].map(len).to_numpy()
+                tokens_flat = [t for items in df[lists] for t in items]
+                keys = np.array([t.casefold() for t in tokens_flat], dtype=object)
+                rows = np.repeat(np.arange(self.size), lengths)
+                self.token_postings[col] = _build_postings(keys, rows)
+                # Eerste schrijfwijze van elk token, voor weergave in de UI
+                labels = {}
+                for key, token in zip(keys, tokens_flat):
+                    labels.setdefault(key, token)
+                self.token_labels[col] = labels
+
+        for col in ranges:
+            if col in df.columns:
+                values = df[col].to_numpy(dtype='float64', na_value=np.nan)
+                finite = np.flatnonzero(~np.isnan(values))
+                order = finite[np.argsort(values[finite], kind='stable')]
+                self.sorted_ranges[col] = (read_only(values[order]), read_only(order))
+
+    def all_rows(self):
+        return np.ones(self.size, dtype=bool)
+
+    def _rows_mask(self, postings, keys):
+        mask = np.zeros(self.size, dtype=bool)
+        for key in keys:
+            rows = postings.get(key)
+            if rows is not None:
+                mask[rows] = True
+        return mask
+
+    def select(self, col, values):
+        # Rijen waarvan col één van de gekozen waarden is; None = geen filter
+        if not values or col not in self.postings:
+            return None
+        return self._rows_mask(self.postings[col], values)
+
+    def select_tokens(self, col, values):
+        # Rijen die minstens één van de gekozen tokens bevatten (exacte match)
+        if not values or col not in self.token_postings:
+            return None
+        return self._rows_mask(self.token_postings[col], [v.casefold() for v in values])
+
+    def select_range(self, col, low=None, high=None):
+        # lo <= waarde <= hi via binair zoeken; lege cellen vallen altijd weg
+        if col not in self.sorted_ranges:
+            return None
+        values, order = self.sorted_ranges[col]
+        start = 0 if low is None else np.searchsorted(values, low, side='left')
+        stop = len(values) if high is None else np.searchsorted(values, high, side='right')
+        mask = np.zeros(self.size, dtype=bool)
+        mask[order[start:stop]] = True
+        return mask
+
+
+def _build_postings(keys, rows):
+    # keys[i] hoort bij rij rows[i]; resultaat: waarde -> gesorteerde rijposities
+    codes, uniques = pd.factorize(keys)
+    valid = codes >= 0
+    codes, rows = codes[valid], rows[valid]
+    if len(codes) == 0:
+        return {}
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    bounds = np.flatnonzero(np.diff(sorted_codes)) + 1
+    groups = np.split(rows[order], bounds)
+    return {uniques[sorted_codes[start]]: read_only(group) for start, group in zip(np.r_[0, bounds], groups)}
+
+
+def combine_masks(index, masks):
+    result = index.all_rows()
+    for mask in masks:
+        if mask is not None:
+            result &= mask
+    return result
+
+
+@per_data_version
+def travel_index(df):
+    return FilterIndex(
+        df,
+        categorical=['continent', 'reistype / doel', 'accommodatie', 'land', 'regio', 'stad'],
+        tokens=['seizoen', 'vervoersmiddel'],
+        ranges=['minimum duur', 'maximum duur', 'budget', 'temperatuur']
+    )
+
+
+@per_data_version
+def restaurants_index(df):
+    return FilterIndex(
+        df,
+        categorical=['keuken', 'land', 'regio', 'stad'],
+        ranges=['prijs']
+    )
+
+
 # --- Filtering functies ---
-def filter_travel_in_memory(df, duur_slider, budget_slider, continent, reistype, seizoen, accommodatie, temp_slider, vervoersmiddelen, land, regio, stad):
-    # Vul lege waarden
-    for col in ['land', 'regio', 'stad', 'continent', 'reistype / doel', 'seizoen', 'accommodatie', 'vervoersmiddel']:
-        if col in df.columns:
-            df[col] = df[col].fillna('')
-
-    filtered = df[
-        (df['minimum duur'] >= duur_slider[0]) &
-        (df['maximum duur'] <= duur_slider[1]) &
-        (df['budget'] >= budget_slider[0]) &
-        (df['budget'] <= budget_slider[1]) &
-        (df['temperatuur'].between(temp_slider[0], temp_slider[1]))
-    ]
-
-    if continent:
-        filtered = filtered[filtered['continent'].isin(continent)]
-    if reistype:
-        filtered = filtered[filtered['reistype / doel'].isin(reistype)]
-    if seizoen:
-        filtered = filtered[filtered['seizoen'].str.contains('|'.join(seizoen), case=False, na=False)]
-    if accommodatie:
-        filtered = filtered[filtered['accommodatie'].isin(accommodatie)]
-    if vervoersmiddelen:
-        filtered = filtered[filtered['vervoersmiddel'].str.contains('|'.join(vervoersmiddelen), case=False, na=False)]
-    if land:
-        filtered = filtered[filtered['land'].isin(land)]
-    if regio:
-        filtered = filtered[filtered['regio'].isin(regio)]
-    if stad:
-        filtered = filtered[filtered['stad'].isin(stad)]
+def travel_masks(index, duur_slider, budget_slider, continent, reistype, seizoen, accommodatie, temp_slider, vervoersmiddelen, land, regio, stad):
+    return {
+        'minimum duur': index.select_range('minimum duur', low=duur_slider[0]),
+        'maximum duur': index.select_range('maximum duur', high=duur_slider[1]),
+        'budget': index.select_range('budget', budget_slider[0], budget_slider[1]),
+        'temperatuur': index.select_range('temperatuur', temp_slider[0], temp_slider[1]),
+        'continent': index.select('continent', continent),
+        'reistype / doel': index.select('reistype / doel', reistype),
+        'seizoen': index.select_tokens('seizoen', seizoen),
+        'accommodatie': index.select('accommodatie', accommodatie),
+        'vervoersmiddel': index.select_tokens('vervoersmiddel', vervoersmiddelen),
+        'land': index.select('land', land),
+        'regio': index.select('regio', regio),
+        'stad': index.select('stad', stad),
+    }
 
-    return filtered
 
+def restaurant_masks(index, keuken, prijs_slider, land, regio, stad):
+    return {
+        'prijs': index.select_range('prijs', prijs_slider[0], prijs_slider[1]),
+        'keuken': index.select('keuken', keuken),
+        'land': index.select('land', land),
+        'regio': index.select('regio', regio),
+        'stad': index.select('stad', stad),
+    }
 
-def filter_restaurants_in_memory(df, keuken, prijs_slider, land, regio, stad):
-    # Vul lege waarden
-    for col in ['land', 'regio', 'stad', 'keuken']:
-        if col in df.columns:
-            df[col] = df[col].fillna('')
 
-    if 'prijs' in df.columns:
-        df['prijs'] = pd.to_numeric(df['prijs'], errors='coerce')
-    else:
-        # Kolom prijs ontbreekt, neem volledige df
-        return df
+def search_mask(masks, scores):
+    # Vrije tekst combineert als één extra filter; None = niet gezocht
+    if scores is not None:
+        masks['zoek'] = scores > 0
+    return masks
 
-    filtered = df[
-        (df['prijs'] >= prijs_slider[0]) &
-        (df['prijs'] <= prijs_slider[1])
-    ]
 
-    if keuken:
-        filtered = filtered[filtered['keuken'].isin(keuken)]
-    if land:
-        filtered = filtered[filtered['land'].isin(land)]
-    if regio:
-        filtered = filtered[filtered['regio'].isin(regio)]
-    if stad:
-        filtered = filtered[filtered['stad'].isin(stad)]
+def filter_travel_in_memory(df, duur_slider, budget_slider, continent, reistype, seizoen, accommodatie, temp_slider, vervoersmiddelen, land, regio, stad, zoekterm=''):
+    # df is al genormaliseerd bij het laden (zie data_loading.normalize_frame).
+    # Met een zoekterm komen de resultaten op relevantie gesorteerd terug.
+    with span("filter_travel", rows_in=len(df)) as s:
+        index = travel_index(df)
+        scores = search_scores(travel_search_index(df), zoekterm) if zoekterm.strip() else None
+        masks = search_mask(travel_masks(index, duur_slider, budget_slider, continent, reistype, seizoen, accommodatie, temp_slider, vervoersmiddelen, land, regio, stad), scores)
+        rows = rank_rows(np.flatnonzero(combine_masks(index, masks.values())), scores)
+        filtered = df.iloc[rows]
+        s.set(rows_out=len(filtered))
+    return filtered
+
+
+def filter_restaurants_in_memory(df, keuken, prijs_slider, land, regio, stad, zoekterm=''):
+    if 'prijs' not in df.columns:
+        # Kolom prijs ontbreekt, neem volledige df
+        return df
 
+    with span("filter_restaurants", rows_in=len(df)) as s:
+        index = restaurants_index(df)
+        scores = search_scores(restaurants_search_index(df), zoekterm) if zoekterm.strip() else None
+        masks = search_mask(restaurant_masks(index, keuken, prijs_slider, land, regio, stad), scores)
+        rows = rank_rows(np.flatnonzero(combine_masks(index, masks.values())), scores)
+        filtered = df.iloc[rows]
+        s.set(rows_out=len(filtered))
     return filtered
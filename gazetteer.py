@@ -0,0 +1,109 @@
+import csv
+import logging
+import os
+import threading
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# --- Instellingen ---
+# Offline lijst van landen en steden met coördinaten; eigen plaatsen kunnen
+# erbij, of als kolommen lat/lon rechtstreeks in de sheets.
+GAZETTEER_PATH = os.environ.get(
+    "ZWW_GAZETTEER",
+    os.path.join(os.path.dirname(__file__), "data", "gazetteer.csv")
+)
+
+
+def _key(text):
+    # Zoals plan_je_dag.normaliseer, maar ook ongevoelig voor accenten
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    return " ".join("".join(c for c in decomposed if not unicodedata.combining(c)).split()).casefold()
+
+
+# --- Gazetteer ---
+class Gazetteer:
+    # Rijen naam,land,soort,lat,lon met soort 'land' of 'stad'. Een plaats wordt
+    # gezocht als stad (in dat land, of anders als unieke naam), dan als regio
+    # en tenslotte als land.
+    def __init__(self, path):
+        self.places = {}
+        self.by_name = {}
+        self.countries = {}
+        try:
+            with open(path, encoding='utf-8', newline='') as f:
+                for row in csv.DictReader(f):
+                    point = (float(row['lat']), float(row['lon']))
+                    naam, land = _key(row['naam']), _key(row['land'])
+                    if row.get('soort') == 'land':
+                        self.countries[naam] = point
+                    else:
+                        self.places[(naam, land)] = point
+                        self.by_name.setdefault(naam, set()).add(point)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Gazetteer %s niet geladen: %s", path, e)
+
+    def _place(self, naam, land):
+        if not naam:
+            return None
+        point = self.places.get((naam, land))
+        if point is None and len(self.by_name.get(naam, ())) == 1:
+            point = next(iter(self.by_name[naam]))
+        return point
+
+    def locate(self, land, regio, stad):
+        land = _key(land)
+        return (
+            self._place(_key(stad), land)
+            or self._place(_key(regio), land)
+            or self.countries.get(land)
+        )
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer():
+    global _gazetteer
+    with _gazetteer_lock:
+        if _gazetteer is None:
+            _gazetteer = Gazetteer(GAZETTEER_PATH)
+        return _gazetteer
+
+
+# --- Coördinaten ---
+def add_coordinates(df):
+    # Vult de kolommen lat/lon (float) aan waar ze leeg zijn, één keer per unieke
+    # (land, regio, stad). Idempotent: zonder lege cellen gebeurt er niets.
+    lat = df['lat'] if 'lat' in df.columns else pd.Series(np.nan, index=df.index)
+    lon = df['lon'] if 'lon' in df.columns else pd.Series(np.nan, index=df.index)
+    missing = (lat.isna() | lon.isna()).to_numpy()
+    if 'lat' in df.columns and 'lon' in df.columns and not missing.any():
+        return df
+
+    gazetteer = get_gazetteer()
+    # Per kolom factoriseren en de codes combineren: goedkoper dan een MultiIndex
+    codes = np.zeros(int(missing.sum()), dtype=np.int64)
+    columns = []
+    for col in ('land', 'regio', 'stad'):
+        values = df[col][missing] if col in df.columns else pd.Series('', index=df.index[missing])
+        col_codes, uniques = pd.factorize(values, use_na_sentinel=False)
+        codes = codes * (len(uniques) + 1) + col_codes
+        columns.append((col_codes, uniques))
+    _, first_rows, codes = np.unique(codes, return_index=True, return_inverse=True)
+    keys = [
+        tuple('' if pd.isna(uniques[col_codes[row]]) else uniques[col_codes[row]] for col_codes, uniques in columns)
+        for row in first_rows
+    ]
+    points = [gazetteer.locate(*key) or (np.nan, np.nan) for key in keys]
+    points = np.array(points, dtype='float64').reshape(-1, 2)
+    lat, lon = lat.astype('float64').copy(), lon.astype('float64').copy()
+    lat[missing] = points[codes, 0]
+    lon[missing] = points[codes, 1]
+    df['lat'] = lat
+    df['lon'] = lon
+    return df
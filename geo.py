@@ -0,0 +1,209 @@
+import heapq
+
+import numpy as np
+import pandas as pd
+
+from data_loading import meal_keys, per_data_version, read_only
+from instrumentation import span
+
+# --- Instellingen ---
+EARTH_RADIUS_KM = 6371.0
+KDTREE_LEAF_SIZE = 64
+
+
+# --- Afstanden ---
+def unit_vectors(lat, lon):
+    # Punten op de eenheidsbol: de rechte (koorde)afstand is monotoon in de
+    # afstand over het aardoppervlak, dus een gewone 3D-boom volstaat.
+    lat, lon = np.radians(np.asarray(lat, dtype='float64')), np.radians(np.asarray(lon, dtype='float64'))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0, 1))
+
+
+def distance_km(a, b):
+    # a, b: (lat, lon)
+    return float(chord_to_km(np.linalg.norm(unit_vectors(*a)[0] - unit_vectors(*b)[0])))
+
+
+# --- k-d-boom ---
+class KDTree:
+    # Statische k-d-boom over 3D-punten, één keer per dataversie opgebouwd.
+    # Bladeren bevatten tot KDTREE_LEAF_SIZE punten en worden gevectoriseerd
+    # doorzocht; een deelboom wordt overgeslagen als het splitsvlak verder ligt
+    # dan de k-de beste afstand tot nu toe.
+    def __init__(self, points, leaf_size=KDTREE_LEAF_SIZE):
+        self.points = read_only(np.ascontiguousarray(points, dtype='float64'))
+        self.leaf_size = leaf_size
+        # Per knoop: (as, splitwaarde, links, rechts) of (None, rijen, None, None) voor een blad
+        self.nodes = []
+        if len(self.points):
+            self._build(np.arange(len(self.points)))
+
+    def __len__(self):
+        return len(self.points)
+
+    def _build(self, rows):
+        node = len(self.nodes)
+        self.nodes.append(None)
+        if len(rows) <= self.leaf_size:
+            self.nodes[node] = (None, read_only(rows), None, None)
+            return node
+        coords = self.points[rows]
+        axis = int(np.argmax(np.ptp(coords, axis=0)))
+        half = len(rows) // 2
+        order = np.argpartition(coords[:, axis], half)
+        split = coords[order[half], axis]
+        left = self._build(rows[order[:half]])
+        right = self._build(rows[order[half:]])
+        self.nodes[node] = (axis, split, left, right)
+        return node
+
+    def query(self, point, k=1):
+        # (rijen, koordeafstanden) van de k dichtste punten, dichtste eerst
+        if not self.nodes:
+            return np.array([], dtype=np.int64), np.array([], dtype='float64')
+        point = np.asarray(point, dtype='float64')
+        best_rows = np.array([], dtype=np.int64)
+        best_dist = np.array([], dtype='float64')
+        worst = np.inf
+        stack = [(0.0, 0)]
+        while stack:
+            bound, node = heapq.heappop(stack)
+            if bound >= worst:
+                # Gelijke afstanden verbeteren niets meer
+                break
+            axis, split, left, right = self.nodes[node]
+            if axis is None:
+                rows = split
+                dist = np.linalg.norm(self.points[rows] - point, axis=1)
+                best_rows = np.concatenate([best_rows, rows])
+                best_dist = np.concatenate([best_dist, dist])
+                if len(best_rows) > k:
+                    keep = np.argpartition(best_dist, k - 1)[:k]
+                    best_rows, best_dist = best_rows[keep], best_dist[keep]
+                if len(best_rows) == k:
+                    worst = best_dist.max()
+                continue
+            diff = point[axis] - split
+            near, far = (left, right) if diff < 0 else (right, left)
+            heapq.heappush(stack, (bound, near))
+            heapq.heappush(stack, (max(bound, abs(diff)), far))
+        order = np.argsort(best_dist, kind='stable')
+        return best_rows[order], best_dist[order]
+
+
+# --- Restaurants in de buurt ---
+class RestaurantGeoIndex:
+    # Per maaltijd (en None = alle) een k-d-boom over de restaurants met coördinaten
+    def __init__(self, df):
+        self.names = df['naam'].astype(str).to_numpy() if 'naam' in df.columns else np.array([], dtype=object)
+        lat = df['lat'].to_numpy(dtype='float64', na_value=np.nan) if 'lat' in df.columns else np.full(len(df), np.nan)
+        lon = df['lon'].to_numpy(dtype='float64', na_value=np.nan) if 'lon' in df.columns else np.full(len(df), np.nan)
+        valid = ~(np.isnan(lat) | np.isnan(lon))
+        points = unit_vectors(lat, lon)
+
+        groups = {None: np.flatnonzero(valid)}
+        if 'maaltijd_lijst' in df.columns:
+            # Eén keer per unieke combinatie van maaltijden, zoals in plan_je_dag.maaltijd_index
+            combinaties = pd.Series(list(df['maaltijd_lijst']), index=np.arange(len(df)))[valid]
+            codes, uniques = pd.factorize(combinaties)
+            keys = [meal_keys(maaltijden) for maaltijden in uniques]
+            rows = np.flatnonzero(valid)
+            for code, maaltijden in enumerate(keys):
+                for maaltijd in maaltijden:
+                    groups.setdefault(maaltijd, []).append(rows[codes == code])
+            groups.update({m: np.sort(np.concatenate(parts)) for m, parts in groups.items() if m is not None})
+        self.trees = {}
+        for maaltijd, rows in groups.items():
+            rows = np.asarray(rows, dtype=np.int64)
+            self.trees[maaltijd] = (read_only(rows), KDTree(points[rows]))
+
+    def nearest(self, lat, lon, maaltijd=None, k=10):
+        # [(naam, km), ...], dichtste eerst; namen komen maar één keer voor
+        key = maaltijd.casefold() if maaltijd else None
+        if key not in self.trees:
+            return []
+        rows, tree = self.trees[key]
+        point = unit_vectors([lat], [lon])[0]
+        # Wat extra opvragen zodat dubbele namen er niet voor zorgen dat er te weinig zijn
+        found, chords = tree.query(point, min(len(tree), 2 * k))
+        result = {}
+        for row, km in zip(rows[found], chord_to_km(chords)):
+            result.setdefault(self.names[row], float(km))
+            if len(result) == k:
+                break
+        return list(result.items())
+
+
+@per_data_version
+def restaurant_geo_index(restaurants_df):
+    with span("geo_index", rows=len(restaurants_df)):
+        return RestaurantGeoIndex(restaurants_df)
+
+
+def nearest_restaurants(restaurants_df, lat, lon, maaltijd=None, k=10):
+    with span("nearest_restaurants", k=k):
+        return restaurant_geo_index(restaurants_df).nearest(lat, lon, maaltijd, k)
+
+
+@per_data_version
+def locatie_coordinaten(reizen_df):
+    # (land, regio, stad) -> (lat, lon), ook voor (land, regio, '') en (land, '', ''):
+    # het gemiddelde van de bestemmingen daarbinnen
+    if not {'lat', 'lon'} <= set(reizen_df.columns):
+        return {}
+    df = reizen_df[['land', 'regio', 'stad', 'lat', 'lon']].dropna(subset=['lat', 'lon'])
+    df = df.astype({'land': str, 'regio': str, 'stad': str})
+    coordinaten = {}
+    for cols in (['land'], ['land', 'regio'], ['land', 'regio', 'stad']):
+        means = df.groupby(cols, observed=True, sort=False)[['lat', 'lon']].mean()
+        for key, (lat, lon) in zip(means.index, means.itertuples(index=False, name=None)):
+            key = key if isinstance(key, tuple) else (key,)
+            coordinaten[key + ('',) * (3 - len(key))] = (float(lat), float(lon))
+    return coordinaten
+
+
+# --- Route ---
+def route_length(points, order):
+    # Totale afstand in km van een open route langs points in deze volgorde
+    if len(order) < 2:
+        return 0.0
+    xyz = unit_vectors(*np.asarray(points, dtype='float64')[list(order)].T)
+    return float(chord_to_km(np.linalg.norm(np.diff(xyz, axis=0), axis=1)).sum())
+
+
+def route_order(points, start=0):
+    # Korte open route langs alle punten, beginnend bij start: eerst telkens het
+    # dichtste nog niet bezochte punt, dan 2-opt tot er niets meer te winnen valt.
+    n = len(points)
+    if n < 3:
+        return list(range(n))
+    xyz = unit_vectors(*np.asarray(points, dtype='float64').T)
+    dist = chord_to_km(np.linalg.norm(xyz[:, None, :] - xyz[None, :, :], axis=2))
+
+    order = [start]
+    remaining = set(range(n)) - {start}
+    while remaining:
+        last = order[-1]
+        nxt = min(remaining, key=lambda j: dist[last, j])
+        order.append(nxt)
+        remaining.remove(nxt)
+
+    with span("route_2opt", stops=n):
+        improved = True
+        while improved:
+            improved = False
+            for i in range(1, n - 1):
+                for j in range(i + 1, n):
+                    a, b = order[i - 1], order[i]
+                    c = order[j]
+                    d = order[j + 1] if j + 1 < n else None
+                    before = dist[a, b] + (dist[c, d] if d is not None else 0)
+                    after = dist[a, c] + (dist[b, d] if d is not None else 0)
+                    if after < before - 1e-9:
+                        order[i:j + 1] = reversed(order[i:j + 1])
+                        improved = True
+    return order
@@ -1,9 +1,31 @@
+import csv
+import os
+import threading
+
+import pandas as pd
 import streamlit as st
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 
+SCOPES = ["https://www.googleapis.com/auth/spreadsheets.readonly"]
+
+_service_lock = threading.Lock()
+_service = None
+_transport = None
+
+
 # --- Google Sheets Service Setup ---
 def get_gsheets_service():
+    # Eén service per proces: credentials en discovery-client worden maar één keer
+    # opgebouwd, zodat het access token hergebruikt wordt tot het verloopt.
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = _build_gsheets_service()
+        return _service
+
+
+def _build_gsheets_service():
     credentials_info = {
         "type": "service_account",
         "project_id": st.secrets["project_id"],
@@ -18,7 +40,97 @@ def get_gsheets_service():
     }
     credentials = service_account.Credentials.from_service_account_info(
         credentials_info,
-        scopes=["https://www.googleapis.com/auth/spreadsheets.readonly"]
+        scopes=SCOPES
     )
-    service = build('sheets', 'v4', credentials=credentials)
-    return service
+    return build('sheets', 'v4', credentials=credentials, cache_discovery=False)
+
+
+# --- Transports ---
+# Een transport levert voor een lijst ranges de ruwe `values` per range op,
+# in dezelfde volgorde. Zo kan een lokale fake Google vervangen in tests.
+class GoogleSheetsTransport:
+    def __init__(self, spreadsheet_id=None):
+        self.spreadsheet_id = spreadsheet_id
+        # httplib2 is niet thread-safe; sessies delen dezelfde service
+        self._lock = threading.Lock()
+
+    def batch_get(self, ranges):
+        spreadsheet_id = self.spreadsheet_id or st.secrets["spreadsheet_id"]
+        service = get_gsheets_service()
+        with self._lock:
+            result = service.spreadsheets().values().batchGet(
+                spreadsheetId=spreadsheet_id,
+                ranges=list(ranges)
+            ).execute()
+        value_ranges = result.get('valueRanges', [])
+        return [vr.get('values', []) for vr in value_ranges]
+
+
+class FakeSheetsTransport:
+    # Ranges worden op tabbladnaam opgezocht: "Opties!A1:P" -> sheets["Opties"]
+    def __init__(self, sheets):
+        self.sheets = sheets
+        self.calls = 0
+
+    def batch_get(self, ranges):
+        self.calls += 1
+        return [[list(row) for row in self.sheets.get(r.split('!')[0], [])] for r in ranges]
+
+
+class SheetNotFoundError(Exception):
+    pass
+
+
+class LocalFileTransport:
+    # Leest de tabbladen uit een lokale bron in plaats van Google Sheets:
+    # een map met <tabblad>.csv-bestanden of één .xlsx-werkmap. Een ontbrekend
+    # tabblad geeft in beide gevallen een SheetNotFoundError met de naam erin.
+    def __init__(self, path):
+        self.path = path
+
+    def batch_get(self, ranges):
+        return [self._read(r.split('!')[0]) for r in ranges]
+
+    def _read(self, sheet_name):
+        if self.path.lower().endswith(('.xlsx', '.xls')):
+            with pd.ExcelFile(self.path) as workbook:
+                if sheet_name not in workbook.sheet_names:
+                    raise SheetNotFoundError(f"Tabblad '{sheet_name}' ontbreekt in {self.path}")
+                df = workbook.parse(sheet_name, header=None, dtype=str)
+            return df.fillna('').values.tolist()
+        csv_path = os.path.join(self.path, f"{sheet_name}.csv")
+        if not os.path.exists(csv_path):
+            raise SheetNotFoundError(f"Tabblad '{sheet_name}' ontbreekt: {csv_path} bestaat niet")
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            return [row for row in csv.reader(f)]
+
+
+def get_secret(key, default=None):
+    # st.secrets gooit een fout als er geen secrets.toml is
+    try:
+        return st.secrets.get(key, default)
+    except Exception:
+        return default
+
+
+def get_sheets_transport():
+    global _transport
+    with _service_lock:
+        if _transport is None:
+            data_source = os.environ.get("ZWW_DATA_SOURCE") or get_secret("data_source")
+            if data_source:
+                _transport = LocalFileTransport(data_source)
+            else:
+                _transport = GoogleSheetsTransport()
+        return _transport
+
+
+def set_sheets_transport(transport):
+    # None zet de standaard Google-transport terug
+    global _transport
+    with _service_lock:
+        _transport = transport
+
+
+def batch_get_values(ranges):
+    return get_sheets_transport().batch_get(ranges)
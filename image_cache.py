@@ -0,0 +1,335 @@
+import base64
+import contextvars
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from instrumentation import record_cache, register_cache_size, span
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # zonder Pillow worden de originele bestanden gebruikt
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# --- Instellingen ---
+IMAGE_CACHE_DIR = os.environ.get(
+    "ZWW_IMAGE_CACHE_DIR",
+    os.path.join(os.path.dirname(__file__), ".image_cache")
+)
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get("ZWW_IMAGE_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+# Data-URI's in het geheugen, gedeeld door alle sessies
+IMAGE_MEMORY_MAX_BYTES = int(os.environ.get("ZWW_IMAGE_MEMORY_MAX_BYTES", 32 * 1024 * 1024))
+MAX_WORKERS = 8
+# (connect, read) in seconden: één dode host mag de pagina niet blokkeren
+FETCH_TIMEOUT = (3.05, 10)
+# Mislukte URL's worden zo lang niet opnieuw geprobeerd; er worden er
+# hoogstens zoveel onthouden (de oudste gaan eerst weg)
+NEGATIVE_TTL = 600
+NEGATIVE_MAX_ENTRIES = 4096
+# Na deze tijd wordt een schijfitem conditioneel (ETag) opnieuw gevalideerd
+REVALIDATE_AFTER = 24 * 3600
+# Kaartjes tonen afbeeldingen 200px breed, inline als data-URI. Een browser
+# kan inline-varianten niet overslaan, dus is er per URL één thumbnail.
+THUMB_WIDTH = 200
+THUMB_FORMAT = 'WEBP'
+THUMB_QUALITY = 80
+
+
+# --- Schijfcache ---
+class DiskImageCache:
+    # Per URL een bestand met de bytes en een JSON-bestand met metadata
+    # (ETag, MIME-type). Begrensd op totale grootte; de minst recent
+    # gebruikte items (mtime) gaan eerst weg.
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.directory, key)
+        return f"{base}.bin", f"{base}.json"
+
+    def get(self, url):
+        data_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(data_path, 'rb') as f:
+                data = f.read()
+            os.utime(data_path)
+        except (OSError, ValueError):
+            return None, None
+        return data, meta
+
+    def touch(self, url, meta):
+        _, meta_path = self._paths(url)
+        meta = dict(meta, fetched_at=time.time())
+        self._write(meta_path, json.dumps(meta).encode('utf-8'))
+        return meta
+
+    def put(self, url, data, meta):
+        data_path, meta_path = self._paths(url)
+        meta = dict(meta, fetched_at=time.time())
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self._write(data_path, data)
+            self._write(meta_path, json.dumps(meta).encode('utf-8'))
+        except OSError as e:
+            logger.warning("Afbeelding niet gecachet: %s", e)
+            return meta
+        self._evict()
+        return meta
+
+    def _write(self, path, payload):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+    def size(self):
+        try:
+            entries = [e for e in os.scandir(self.directory) if e.name.endswith('.bin')]
+        except OSError:
+            return 0, 0
+        return sum(e.stat().st_size for e in entries), len(entries)
+
+    def _evict(self):
+        with self._lock:
+            try:
+                entries = [e for e in os.scandir(self.directory) if e.name.endswith('.bin')]
+            except OSError:
+                return
+            stats = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in entries]
+            total = sum(size for _, size, _ in stats)
+            for _, size, path in sorted(stats):
+                if total <= self.max_bytes:
+                    break
+                for p in (path, path[:-len('.bin')] + '.json'):
+                    try:
+                        os.remove(p)
+                    except OSError:
+                        pass
+                total -= size
+
+
+# --- Geheugencache ---
+class MemoryLRU:
+    # Begrensd op het totaal aantal bytes (len van de waarden); bij overschrijden
+    # gaan de minst recent gebruikte items eerst weg. Items ouder dan max_age
+    # tellen als miss, zodat de schijfcache ze opnieuw kan valideren.
+    def __init__(self, max_bytes, max_age=None):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.nbytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, stored_at, _ = item
+            if self.max_age is not None and time.time() - stored_at > self.max_age:
+                self._remove(key)
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value, nbytes):
+        with self._lock:
+            if key in self._items:
+                self._remove(key)
+            if nbytes > self.max_bytes:
+                return
+            self._items[key] = (value, time.time(), nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                self._remove(next(iter(self._items)))
+
+    def _remove(self, key):
+        _, _, nbytes = self._items.pop(key)
+        self.nbytes -= nbytes
+
+    def size(self):
+        with self._lock:
+            return self.nbytes, len(self._items)
+
+
+# --- Ophalen ---
+_disk_cache = DiskImageCache(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES)
+_memory_cache = MemoryLRU(IMAGE_MEMORY_MAX_BYTES, max_age=REVALIDATE_AFTER)
+register_cache_size("image_memory", _memory_cache.size)
+register_cache_size("image_disk", _disk_cache.size)
+_failures = OrderedDict()
+_failures_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="image-prefetch")
+
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+_session.mount("http://", _adapter)
+_session.mount("https://", _adapter)
+
+
+def _recently_failed(url):
+    with _failures_lock:
+        expires = _failures.get(url)
+        if expires is None:
+            return False
+        if expires < time.time():
+            del _failures[url]
+            return False
+        return True
+
+
+def _mark_failed(url):
+    # Alle items hebben dezelfde TTL, dus de volgorde is ook die van verlopen:
+    # verlopen items vooraan worden opgeruimd, en boven de grens de oudste.
+    now = time.time()
+    with _failures_lock:
+        _failures[url] = now + NEGATIVE_TTL
+        _failures.move_to_end(url)
+        while _failures and (next(iter(_failures.values())) < now or len(_failures) > NEGATIVE_MAX_ENTRIES):
+            _failures.popitem(last=False)
+
+
+# --- Thumbnails ---
+_MAGIC = [
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+]
+
+
+def sniff_mime(data):
+    # Het echte type uit de eerste bytes, los van wat de server beweert
+    for magic, mime in _MAGIC:
+        if data.startswith(magic):
+            return mime
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    if data.lstrip()[:5] in (b'<?xml', b'<svg '):
+        return 'image/svg+xml'
+    return None
+
+
+def make_thumbnail(data, width):
+    # Verkleint tot `width` px breed (nooit vergroten) en hercodeert als WebP.
+    # Lukt dat niet, dan blijft het origineel behouden met zijn echte type.
+    if Image is not None:
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                img = ImageOps.exif_transpose(img)
+                if img.width > width:
+                    img = img.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+                if img.mode not in ('RGB', 'RGBA'):
+                    img = img.convert('RGBA' if 'A' in img.getbands() or 'transparency' in img.info else 'RGB')
+                out = io.BytesIO()
+                img.save(out, format=THUMB_FORMAT, quality=THUMB_QUALITY)
+                return out.getvalue(), f"image/{THUMB_FORMAT.lower()}"
+        except Exception as e:
+            logger.info("Thumbnail maken mislukt: %s", e)
+    return data, sniff_mime(data)
+
+
+def _thumbnail_key(url):
+    return f"{url}#{THUMB_WIDTH}w"
+
+
+# --- Ophalen ---
+def fetch_thumbnail(url):
+    # Geeft (bytes, mime) van de thumbnail terug, of None als de afbeelding niet lukt
+    if _recently_failed(url):
+        return None
+
+    key = _thumbnail_key(url)
+    data, meta = _disk_cache.get(key)
+    if data is not None:
+        thumbnail = (data, meta.get('mime'))
+        if time.time() - meta.get('fetched_at', 0) < REVALIDATE_AFTER:
+            record_cache("image_disk", True)
+            return thumbnail
+    record_cache("image_disk", False)
+
+    headers = {}
+    if data is not None and meta.get('etag'):
+        headers['If-None-Match'] = meta['etag']
+    try:
+        response = _session.get(url, headers=headers, timeout=FETCH_TIMEOUT)
+        if response.status_code == 304 and data is not None:
+            _disk_cache.touch(key, meta)
+            return thumbnail
+        response.raise_for_status()
+    except Exception as e:
+        if data is not None:
+            # Verouderde kopie is beter dan niets
+            return thumbnail
+        logger.info("Afbeelding %s niet opgehaald: %s", url, e)
+        _mark_failed(url)
+        return None
+
+    data, mime = make_thumbnail(response.content, THUMB_WIDTH)
+    if mime is None:
+        # Geen herkenbare afbeelding (bv. een HTML-foutpagina)
+        _mark_failed(url)
+        return None
+    _disk_cache.put(key, data, {'etag': response.headers.get('ETag'), 'mime': mime})
+    return data, mime
+
+
+def _data_uri(data, mime):
+    return f"data:{mime};base64,{base64.b64encode(data).decode()}"
+
+
+def image_sources(url):
+    # {'src': data-URI van de thumbnail} voor een <img>-tag, of None.
+    # Gedeeld via de geheugencache: de base64-string bestaat één keer per proces.
+    sources = _memory_cache.get(url)
+    record_cache("image_memory", sources is not None)
+    if sources is not None:
+        return sources
+    thumbnail = fetch_thumbnail(url)
+    if thumbnail is None:
+        return None
+    sources = {'src': _data_uri(*thumbnail)}
+    _memory_cache.put(url, sources, len(sources['src']))
+    return sources
+
+
+def _unique_urls(urls):
+    return list(dict.fromkeys(u.strip() for u in urls if u and u.strip()))
+
+
+def _map(fn, urls):
+    # Zoals _executor.map, maar elke taak loopt in een kopie van de context van
+    # de aanroeper: poolthreads erven contextvars (zoals ?perf=1) niet
+    futures = [_executor.submit(contextvars.copy_context().run, fn, url) for url in urls]
+    return [future.result() for future in futures]
+
+
+def prefetch_thumbnails(urls):
+    # Zoals prefetch_images, maar met de bytes zelf: url -> (bytes, mime) of None
+    unique_urls = _unique_urls(urls)
+    return dict(zip(unique_urls, _map(fetch_thumbnail, unique_urls)))
+
+
+def prefetch_images(urls):
+    # Haalt alle (unieke, niet-lege) URL's gelijktijdig op; url -> image_sources of None
+    unique_urls = _unique_urls(urls)
+    with span("image_prefetch", urls=len(unique_urls)) as s:
+        sources = dict(zip(unique_urls, _map(image_sources, unique_urls)))
+        s.set(bytes=sum(len(b['src']) for b in sources.values() if b))
+    return sources
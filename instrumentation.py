@@ -0,0 +1,182 @@
+import bisect
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger("zww.perf")
+
+# --- Instellingen ---
+# Uit tenzij ZWW_PERF=1 (voor het hele proces) of ?perf=1 (enkel voor die
+# rerun van die sessie); uitgeschakeld kost een span enkel een functieaanroep
+# die een gedeeld no-op object teruggeeft.
+_enabled_default = os.environ.get("ZWW_PERF") == "1"
+_enabled = contextvars.ContextVar("zww_perf_enabled", default=None)
+# Bovengrenzen (ms) van de histogram-buckets; de laatste bucket is alles erboven
+BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+# Na zoveel reruns worden de histogrammen als één JSON-regel gelogd
+LOG_HISTOGRAMS_EVERY = 50
+
+_lock = threading.Lock()
+_local = threading.local()
+_stages = {}
+_caches = {}
+_runs = 0
+
+
+def is_enabled():
+    enabled = _enabled.get()
+    return _enabled_default if enabled is None else enabled
+
+
+def set_enabled(enabled):
+    # Geldt enkel voor de huidige context (de scriptthread van één rerun);
+    # None valt terug op ZWW_PERF
+    _enabled.set(None if enabled is None else bool(enabled))
+
+
+# --- Spans ---
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __exit__(self, *exc):
+        duration_ms = (time.perf_counter() - self.start) * 1000
+        _record(self.name, duration_ms, self.attrs)
+        return False
+
+
+def span(name, **attrs):
+    # Gebruik: with span("filter_travel", rows_in=len(df)) as s: ...; s.set(rows_out=n)
+    if not is_enabled():
+        return _NOOP
+    return Span(name, attrs)
+
+
+class _StageStats:
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.recent = deque(maxlen=1000)
+
+    def add(self, duration_ms):
+        self.count += 1
+        self.total_ms += duration_ms
+        self.buckets[bisect.bisect_left(BUCKETS_MS, duration_ms)] += 1
+        self.recent.append(duration_ms)
+
+    def summary(self):
+        recent = sorted(self.recent)
+
+        def pct(p):
+            return round(recent[min(len(recent) - 1, int(p * len(recent)))], 3) if recent else None
+
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else None,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "histogram": {
+                (f"<={b}ms" if i < len(BUCKETS_MS) else f">{BUCKETS_MS[-1]}ms"): n
+                for i, (b, n) in enumerate(zip(BUCKETS_MS + [None], self.buckets))
+            },
+        }
+
+
+def _record(name, duration_ms, attrs):
+    with _lock:
+        _stages.setdefault(name, _StageStats()).add(duration_ms)
+    run = getattr(_local, "spans", None)
+    if run is not None:
+        run.append({"stage": name, "ms": round(duration_ms, 3), **attrs})
+
+
+# --- Cache hit/miss ---
+def record_cache(name, hit):
+    if not is_enabled():
+        return
+    with _lock:
+        counts = _caches.setdefault(name, {"hits": 0, "misses": 0})
+        counts["hits" if hit else "misses"] += 1
+    run = getattr(_local, "spans", None)
+    if run is not None:
+        run.append({"stage": f"cache:{name}", "hit": hit})
+
+
+# --- Cachegrootte ---
+# Caches registreren een functie die (bytes, items) teruggeeft; die wordt enkel
+# opgeroepen bij een snapshot, dus niet op het hete pad.
+_cache_sizes = {}
+
+
+def register_cache_size(name, size_fn):
+    _cache_sizes[name] = size_fn
+
+
+def cache_sizes():
+    sizes = {}
+    for name, size_fn in list(_cache_sizes.items()):
+        try:
+            nbytes, items = size_fn()
+        except Exception as e:
+            logger.warning("Cachegrootte van %s niet bepaald: %s", name, e)
+            continue
+        sizes[name] = {"bytes": int(nbytes), "items": int(items)}
+    return sizes
+
+
+# --- Per rerun ---
+def start_run():
+    _local.spans = [] if is_enabled() else None
+
+
+def finish_run():
+    # Sluit de rerun af: één JSON-logregel met alle spans, en af en toe de histogrammen
+    global _runs
+    spans = getattr(_local, "spans", None)
+    _local.spans = None
+    if not is_enabled() or spans is None:
+        return []
+    logger.info(json.dumps({"event": "rerun", "spans": spans}, ensure_ascii=False))
+    with _lock:
+        _runs += 1
+        log_histograms = _runs % LOG_HISTOGRAMS_EVERY == 0
+    if log_histograms:
+        logger.info(json.dumps({"event": "histograms", **snapshot()}, ensure_ascii=False))
+    return spans
+
+
+def snapshot():
+    with _lock:
+        stats = {
+            "stages": {name: stats.summary() for name, stats in _stages.items()},
+            "caches": {name: dict(counts) for name, counts in _caches.items()},
+        }
+    stats["cache_sizes"] = cache_sizes()
+    return stats
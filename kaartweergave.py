@@ -1,69 +1,151 @@
+import html
+import math
+
+import pandas as pd
 import streamlit as st
-from data_loading import image_to_base64_cached
+from data_loading import format_number
+from image_cache import prefetch_images
+from instrumentation import span
+
+PAGINA_GROOTTE = 20
+
+KAART_STIJL = "border:1px solid #ddd; border-radius:8px; padding:20px; margin-bottom:15px; box-shadow:2px 2px 8px rgba(0,0,0,0.2); background-color:#18181b; overflow:auto;"
+IMG_STIJL = "border-radius:8px; float:right; margin-left:30px;"
+GEEN_FOTO = "<div style='width:200px; height:150px; background:#444; border-radius:8px; float:right;'></div>"
+
+# --- Veldhulpjes ---
+# Elk kaartje is één f-string per record (uit to_dict('records')); de pagina
+# wordt in één pass samengevoegd, zonder iterrows.
+def _tekst(waarde):
+    if waarde is None or pd.isna(waarde):
+        return ''
+    return html.escape(str(waarde))
+
+
+def _getal(waarde):
+    try:
+        return format_number(waarde)
+    except (TypeError, ValueError):
+        return ''
+
+
+def _lijst(waarden):
+    return html.escape(', '.join(waarden)) if isinstance(waarden, tuple) else ''
+
+
+def _img_blok(record, afbeeldingen):
+    # Opzoeken met de ruwe URL (zoals in afbeeldingen), escapen pas in de tag
+    url = record.get('foto')
+    url = '' if url is None or pd.isna(url) else str(url).strip()
+    bron = afbeeldingen.get(url) if url else None
+    if not bron:
+        return GEEN_FOTO
+    return f'<img src="{html.escape(bron["src"])}" width="200" style="{IMG_STIJL}" />'
+
+
+def _naam_html(record, tekst):
+    url = _tekst(record.get('url')).strip()
+    if url:
+        return f'<a href="{url}" target="_blank" style="color:#1e90ff; text-decoration:none;">{tekst}</a>'
+    return f'<span style="color:#fff; font-weight:bold;">{tekst}</span>'
+
+
+def _locatie(record):
+    return f"{_tekst(record.get('land'))} – {_tekst(record.get('regio'))} – {_tekst(record.get('stad'))}"
+
+
+def _veld(label, waarde, achter=''):
+    return f"<div style='color:#fff;'><b>{label}:</b> {waarde}{achter}</div>"
+
+
+def _opmerking(record):
+    return f"<div style='color:#ccc; font-style:italic;'>{_tekst(record.get('opmerking'))}</div>"
+
+
+def _kaart(img, naam, inhoud):
+    return (
+        f"<div style='{KAART_STIJL}'>{img}"
+        f'<div style="text-align:left; max-width: calc(100% - 250px);">'
+        f"<h3 style='margin-bottom:10px; color:#fff;'>{naam}</h3>{inhoud}</div></div>"
+    )
+
 
 # --- Kaartweergaves ---
+def _bestemming_kaart(r, afbeeldingen):
+    # Overeenkomst enkel bij rangschikken op voorkeur (zie ranking.rank_travel_in_memory)
+    overeenkomst = _veld("Overeenkomst", _getal(r['match']), "%") if 'match' in r else ''
+    return _kaart(
+        _img_blok(r, afbeeldingen),
+        _naam_html(r, _locatie(r)),
+        f"{overeenkomst}{_opmerking(r)}"
+        f"{_veld('Prijs', '€' + _getal(r.get('budget')))}"
+        f"{_veld('Duur', _getal(r.get('minimum duur')) + ' - ' + _getal(r.get('maximum duur')), ' dagen')}"
+        f"{_veld('Temperatuur', _getal(r.get('temperatuur')), ' °C')}"
+        f"{_veld('Vervoersmiddel', _lijst(r.get('vervoersmiddel_lijst')))}"
+    )
 
-def bestemming_kaartje(row):
-    foto_url = row.get('foto', '').strip()
-    url = row.get('url', '').strip()
-    img_block = ""
-    if foto_url:
-        img_b64 = image_to_base64_cached(foto_url)
-        if img_b64:
-            img_block = f'<img src="{img_b64}" width="200" style="border-radius:8px; float:right; margin-left:30px;" />'
-        else:
-            img_block = "<div style='width:200px; height:150px; background:#444; border-radius:8px; float:right;'></div>"
-    else:
-        img_block = "<div style='width:200px; height:150px; background:#444; border-radius:8px; float:right;'></div>"
-
-    locatie_tekst = f"{row.get('land', '')} – {row.get('regio', '')} – {row.get('stad', '')}"
-
-    naam_html = f'<a href="{url}" target="_blank" style="color:#1e90ff; text-decoration:none;">{locatie_tekst}</a>' if url else f'<span style="color:#fff; font-weight:bold;">{locatie_tekst}</span>'
-    
-    vervoersmiddel_clean = ', '.join([v.strip() for v in row.get('vervoersmiddel', '').split(';') if v.strip()])
-
-    kaart_html = f"""
-    <div style='border:1px solid #ddd; border-radius:8px; padding:20px; margin-bottom:15px; box-shadow:2px 2px 8px rgba(0,0,0,0.2); background-color:#18181b; overflow:auto;'>
-        {img_block}
-        <div style="text-align:left; max-width: calc(100% - 250px);">
-            <h3 style='margin-bottom:10px; color:#fff;'>{naam_html}</h3>
-            <div style='color:#ccc; font-style:italic;'>{row.get('opmerking', '') or ''}</div>
-            <div style='color:#fff;'><b>Prijs:</b> €{row.get('budget', '')}</div>
-            <div style='color:#fff;'><b>Duur:</b> {row.get('minimum duur', '')} - {row.get('maximum duur', '')} dagen</div>
-            <div style='color:#fff;'><b>Temperatuur:</b> {row.get('temperatuur', '')} °C</div>
-            <div style='color:#fff;'><b>Vervoersmiddel:</b> {vervoersmiddel_clean}</div>
-        </div>
-    </div>
-    """
-    st.markdown(kaart_html, unsafe_allow_html=True)
-
-def restaurant_kaartje(row):
-    foto_url = row.get('foto', '').strip()
-    url = row.get('url', '').strip()
-    img_block = ""
-    if foto_url:
-        img_b64 = image_to_base64_cached(foto_url)
-        if img_b64:
-            img_block = f'<img src="{img_b64}" width="200" style="border-radius:8px; float:right; margin-left:30px;" />'
+
+def _restaurant_kaart(r, afbeeldingen):
+    return _kaart(
+        _img_blok(r, afbeeldingen),
+        _naam_html(r, _tekst(r.get('naam'))),
+        f"{_veld('Keuken', _tekst(r.get('keuken')))}"
+        f"{_veld('Prijs', _getal(r.get('prijs')))}"
+        f"{_veld('Locatie', _locatie(r))}"
+        f"{_opmerking(r)}"
+    )
+
+
+def bestemming_kaartjes_html(df, afbeeldingen):
+    return "\n".join([_bestemming_kaart(r, afbeeldingen) for r in df.to_dict('records')])
+
+
+def restaurant_kaartjes_html(df, afbeeldingen):
+    return "\n".join([_restaurant_kaart(r, afbeeldingen) for r in df.to_dict('records')])
+
+
+def bestemming_kaartje(row, afbeeldingen=None):
+    df = row.to_frame().T
+    if afbeeldingen is None:
+        afbeeldingen = prefetch_images(df.get('foto', []))
+    st.markdown(bestemming_kaartjes_html(df, afbeeldingen), unsafe_allow_html=True)
+
+
+def restaurant_kaartje(row, afbeeldingen=None):
+    df = row.to_frame().T
+    if afbeeldingen is None:
+        afbeeldingen = prefetch_images(df.get('foto', []))
+    st.markdown(restaurant_kaartjes_html(df, afbeeldingen), unsafe_allow_html=True)
+
+
+# --- Resultatenlijst ---
+def toon_resultaten(df, kaartjes_html, key, pagina_grootte=PAGINA_GROOTTE):
+    # Toont één pagina resultaten: als kaartjes (één element voor de hele
+    # pagina) of als tabel. Enkel de afbeeldingen van die pagina worden opgehaald.
+    aantal_paginas = max(1, math.ceil(len(df) / pagina_grootte))
+    pagina_key = f"{key}_pagina"
+    if st.session_state.get(pagina_key, 1) > aantal_paginas:
+        st.session_state[pagina_key] = 1
+
+    col1, col2 = st.columns([3, 1])
+    with col2:
+        weergave = st.radio("Weergave", ["Kaartjes", "Tabel"], horizontal=True, key=f"{key}_weergave", label_visibility="collapsed")
+    with col1:
+        if aantal_paginas > 1:
+            pagina = st.number_input(f"Pagina (van {aantal_paginas})", min_value=1, max_value=aantal_paginas, step=1, key=pagina_key)
         else:
-            img_block = "<div style='width:200px; height:150px; background:#444; border-radius:8px; float:right;'></div>"
+            pagina = 1
+
+    start = (pagina - 1) * pagina_grootte
+    pagina_df = df.iloc[start:start + pagina_grootte]
+    st.caption(f"Resultaten {start + 1}–{start + len(pagina_df)} van {len(df)}")
+
+    if weergave == "Tabel":
+        lijst_cols = [c for c in pagina_df.columns if c.endswith('_lijst')]
+        st.dataframe(pagina_df.drop(columns=lijst_cols), hide_index=True)
     else:
-        img_block = "<div style='width:200px; height:150px; background:#444; border-radius:8px; float:right;'></div>"
-
-    locatie_tekst = f"{row.get('land', '')} – {row.get('regio', '')} – {row.get('stad', '')}"
-
-    naam_html = f'<a href="{url}" target="_blank" style="color:#1e90ff; text-decoration:none;">{row.get("naam", "")}</a>' if url else f'<span style="color:#fff; font-weight:bold;">{row.get("naam", "")}</span>'
-
-    kaart_html = f"""
-    <div style='border:1px solid #ddd; border-radius:8px; padding:20px; margin-bottom:15px; box-shadow:2px 2px 8px rgba(0,0,0,0.2); background-color:#18181b; overflow:auto;'>
-        {img_block}
-        <div style="text-align:left; max-width: calc(100% - 250px);">
-            <h3 style='margin-bottom:10px; color:#fff;'>{naam_html}</h3>
-            <div style='color:#fff;'><b>Keuken:</b> {row.get('keuken', '')}</div>
-            <div style='color:#fff;'><b>Prijs:</b> {row.get('prijs', '')}</div>
-            <div style='color:#fff;'><b>Locatie:</b> {locatie_tekst}</div>
-            <div style='color:#ccc; font-style:italic;'>{row.get('opmerking', '') or ''}</div>
-        </div>
-    </div>
-    """
-    st.markdown(kaart_html, unsafe_allow_html=True)
+        afbeeldingen = prefetch_images(pagina_df.get('foto', []))
+        with span("card_render", cards=len(pagina_df)) as s:
+            html = kaartjes_html(pagina_df, afbeeldingen)
+            s.set(html_bytes=len(html))
+            st.markdown(html, unsafe_allow_html=True)
@@ -1,26 +1,248 @@
 from fpdf import FPDF
+import hashlib
 import io
+import json
+import logging
 import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from data_loading import data_version, format_number, per_data_version
+from image_cache import prefetch_thumbnails
+from instrumentation import record_cache, register_cache_size, span
+
+logger = logging.getLogger(__name__)
+
+# --- Instellingen ---
+FONT_PATH = os.path.join(os.path.dirname(__file__), "fonts", "DejaVuSans.ttf")
+# Latijn (ook uitgebreid), Grieks, Cyrillisch, leestekens, valuta en symbolen:
+# genoeg voor de sheets, en een kwart van het volledige lettertype.
+FONT_UNICODE_RANGES = [
+    (0x0020, 0x024F), (0x0370, 0x052F), (0x1E00, 0x1FFF),
+    (0x2000, 0x206F), (0x20A0, 0x20BF), (0x2100, 0x21FF),
+]
+FONT_CACHE_DIR = os.environ.get(
+    "ZWW_FONT_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "zww-fonts")
+)
+DAGEN_PER_WEEK = 7
+# Zoveel gegenereerde PDF's blijven in het geheugen, samen nooit meer dan zoveel bytes
+PDF_CACHE_SIZE = 16
+PDF_CACHE_MAX_BYTES = 32 * 1024 * 1024
+# Foto's in de PDF: breedte in mm (de thumbnail van 200px volstaat)
+PDF_FOTO_BREEDTE = 35
+MAALTIJDEN = ("ontbijt", "lunch", "diner")
+
+
+# --- Lettertype ---
+# Het volledige DejaVuSans.ttf inlezen kost per document tientallen ms. Eén keer
+# per proces wordt een subset gemaakt (op schijf bewaard over herstarts heen);
+# tekst met tekens buiten die subset valt terug op het volledige bestand.
+_font_lock = threading.Lock()
+_font_path = None
+_font_chars = frozenset(
+    c for start, stop in FONT_UNICODE_RANGES for c in range(start, stop + 1)
+)
+
+
+def subset_font_path():
+    global _font_path
+    with _font_lock:
+        if _font_path is None:
+            _font_path = _build_font_subset()
+    return _font_path
+
+
+def _build_font_subset():
+    try:
+        with open(FONT_PATH, 'rb') as f:
+            key = hashlib.sha1(f.read() + repr(FONT_UNICODE_RANGES).encode()).hexdigest()[:16]
+        path = os.path.join(FONT_CACHE_DIR, f"DejaVuSans-{key}.ttf")
+        if os.path.exists(path):
+            return path
+
+        from fontTools import subset
+        options = subset.Options()
+        options.layout_features = ['*']
+        options.name_IDs = ['*']
+        options.notdef_outline = True
+        options.drop_tables += ['FFTM']
+        font = subset.load_font(FONT_PATH, options)
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(unicodes=_font_chars)
+        subsetter.subset(font)
+
+        os.makedirs(FONT_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        subset.save_font(font, tmp_path, options)
+        os.replace(tmp_path, path)
+        return path
+    except Exception as e:
+        logger.warning("Lettertype niet verkleind, volledig bestand gebruikt: %s", e)
+        return FONT_PATH
+
+
+def _font_for(texts):
+    if all(ord(c) in _font_chars for text in texts for c in text if c not in "\n\t"):
+        return subset_font_path()
+    return FONT_PATH
+
+
+# --- Restaurantdetails ---
+@per_data_version
+def restaurant_details(restaurants_df):
+    # naam -> {keuken, prijs, stad, opmerking, foto}; bij dubbele namen de eerste
+    cols = [c for c in ('keuken', 'prijs', 'stad', 'opmerking', 'foto') if c in restaurants_df.columns]
+    details = {}
+    for naam, *waarden in restaurants_df[['naam'] + cols].itertuples(index=False):
+        details.setdefault(naam, {
+            col: waarde for col, waarde in zip(cols, waarden)
+            if waarde is not None and waarde == waarde and str(waarde).strip()
+        })
+    return details
+
+
+def _detail_regel(detail):
+    delen = [str(detail[c]) for c in ('keuken', 'stad') if c in detail]
+    if 'prijs' in detail:
+        delen.append(f"€{format_number(detail['prijs'])}")
+    return " · ".join(delen)
+
+
+# --- PDF opbouwen ---
+def _weken(weekplanning, weken):
+    # [(weeknummer, [(dagnummer, dag), ...]), ...] binnen de gekozen weken (1-based, inclusief)
+    eerste, laatste = weken or (1, max(1, -(-len(weekplanning) // DAGEN_PER_WEEK)))
+    resultaat = []
+    for week in range(eerste, laatste + 1):
+        start = (week - 1) * DAGEN_PER_WEEK
+        dagen = list(enumerate(weekplanning[start:start + DAGEN_PER_WEEK], start + 1))
+        if dagen:
+            resultaat.append((week, dagen))
+    return resultaat
+
+
+def write_pdf(weekplanning, stream, details=None, fotos=None, weken=None):
+    # Schrijft de PDF pagina per pagina op en daarna in één keer naar stream.
+    # details: naam -> restaurantdetails; fotos: url -> (bytes, mime) of None.
+    # Zonder dagen (lege planning of weken na het einde) een ValueError: een
+    # PDF zonder pagina's is geen geldige PDF.
+    details = details or {}
+    fotos = fotos or {}
+    per_week = _weken(weekplanning, weken)
+    if not per_week:
+        raise ValueError("Geen dagen in de gekozen weken" if weekplanning else "Lege weekplanning")
+    texts = [json.dumps(weekplanning, ensure_ascii=False), json.dumps(details, ensure_ascii=False, default=str)]
 
-def create_pdf_from_weekplanning(weekplanning):
     pdf = FPDF()
-    pdf.add_page()
-    font_path = os.path.join(os.path.dirname(__file__), "fonts", "DejaVuSans.ttf")
-    pdf.add_font("DejaVu", "", font_path, uni=True)
+    pdf.add_font("DejaVu", "", _font_for(texts))
+    meerdere_weken = len(per_week) > 1 or weken is not None
+
+    for week, dagen in per_week:
+        pdf.add_page()
+        pdf.set_font("DejaVu", size=12)
+        titel = "Weekplanning Reis en Restaurants"
+        if meerdere_weken:
+            titel += f" – week {week}"
+        pdf.cell(0, 10, titel, new_x="LMARGIN", new_y="NEXT", align="C")
+        pdf.ln(10)
+        for i, dag in dagen:
+            _schrijf_dag(pdf, i, dag, details, fotos)
+            pdf.ln(5)
+
+    pdf.output(stream)
+    return pdf.pages_count
+
+
+def _schrijf_dag(pdf, i, dag, details, fotos):
     pdf.set_font("DejaVu", size=12)
+    pdf.multi_cell(0, 10, f"Dag {i}: {dag['bestemming']}", new_x="LMARGIN", new_y="NEXT")
+    for maaltijd in MAALTIJDEN:
+        naam = dag.get(maaltijd)
+        pdf.set_font("DejaVu", size=12)
+        pdf.multi_cell(0, 10, f"  {maaltijd.capitalize()}: {naam or 'geen geselecteerd'}", new_x="LMARGIN", new_y="NEXT")
+        detail = details.get(naam) if naam else None
+        if detail:
+            _schrijf_details(pdf, detail, fotos.get(str(detail.get('foto', '')).strip()))
+
+
+def _schrijf_details(pdf, detail, foto):
+    breedte = pdf.epw - (PDF_FOTO_BREEDTE + 5 if foto else 0)
+    if foto and pdf.will_page_break(PDF_FOTO_BREEDTE):
+        pdf.add_page()
+    top = pdf.get_y()
+    pdf.set_font("DejaVu", size=10)
+    regel = _detail_regel(detail)
+    if regel:
+        pdf.set_x(pdf.l_margin + 8)
+        pdf.multi_cell(breedte - 8, 6, regel, new_x="LMARGIN", new_y="NEXT")
+    if 'opmerking' in detail:
+        pdf.set_x(pdf.l_margin + 8)
+        pdf.multi_cell(breedte - 8, 6, str(detail['opmerking']), new_x="LMARGIN", new_y="NEXT")
+    if foto:
+        data, _ = foto
+        try:
+            info = pdf.image(io.BytesIO(data), x=pdf.l_margin + pdf.epw - PDF_FOTO_BREEDTE, y=top, w=PDF_FOTO_BREEDTE)
+            pdf.set_y(max(pdf.get_y(), top + info.rendered_height) + 2)
+        except Exception as e:
+            logger.info("Foto niet in PDF opgenomen: %s", e)
+
+
+def create_pdf_from_weekplanning(weekplanning, details=None, fotos=None, weken=None):
+    with span("pdf_export", dagen=len(weekplanning)) as s:
+        buffer = io.BytesIO()
+        pages = write_pdf(weekplanning, buffer, details, fotos, weken)
+        buffer.seek(0)
+        s.set(bytes=buffer.getbuffer().nbytes, pages=pages)
+    return buffer
+
+
+# --- Gememoiseerde download ---
+_pdf_cache = OrderedDict()
+_pdf_cache_lock = threading.Lock()
+
+
+def _pdf_cache_size():
+    with _pdf_cache_lock:
+        return sum(len(data) for data in _pdf_cache.values()), len(_pdf_cache)
+
+
+register_cache_size("pdf_export", _pdf_cache_size)
+
+
+def planning_key(weekplanning, restaurants_df=None, weken=None):
+    # Hash van de inhoud: dezelfde planning (en dataversie) geeft dezelfde PDF
+    payload = json.dumps(
+        [weekplanning, weken, data_version(restaurants_df) if restaurants_df is not None else None],
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def weekplanning_pdf_bytes(weekplanning, restaurants_df=None, weken=None):
+    # Pas opgeroepen bij het downloaden. Met restaurants_df komen keuken, prijs,
+    # opmerking en foto van elk gekozen restaurant mee in de PDF.
+    key = planning_key(weekplanning, restaurants_df, weken)
+    with _pdf_cache_lock:
+        if key in _pdf_cache:
+            _pdf_cache.move_to_end(key)
+            record_cache("pdf_export", True)
+            return _pdf_cache[key]
+    record_cache("pdf_export", False)
+
+    details = fotos = None
+    if restaurants_df is not None and 'naam' in restaurants_df.columns:
+        alle_details = restaurant_details(restaurants_df)
+        namen = {dag.get(m) for _, dagen in _weken(weekplanning, weken) for _, dag in dagen for m in MAALTIJDEN}
+        details = {naam: alle_details[naam] for naam in namen if naam in alle_details}
+        fotos = prefetch_thumbnails(d.get('foto', '') for d in details.values())
+    data = create_pdf_from_weekplanning(weekplanning, details, fotos, weken).getvalue()
 
-    pdf.cell(0, 10, "Weekplanning Reis en Restaurants", ln=True, align="C")
-    pdf.ln(10)
-
-    for i, dag in enumerate(weekplanning, 1):
-        text = (
-            f"Dag {i}: {dag['bestemming']}  \n"
-            f"  Ontbijt: {dag.get('ontbijt', 'geen geselecteerd')}\n"
-            f"  Lunch: {dag.get('lunch', 'geen geselecteerd')}\n"
-            f"  Diner: {dag.get('diner', 'geen geselecteerd')}\n"
-        )
-        pdf.multi_cell(0, 10, text)
-        pdf.ln(5)
-
-    pdf_bytes = pdf.output(dest='S')
-    return io.BytesIO(pdf_bytes)
+    with _pdf_cache_lock:
+        _pdf_cache[key] = data
+        total = sum(len(v) for v in _pdf_cache.values())
+        while len(_pdf_cache) > 1 and (len(_pdf_cache) > PDF_CACHE_SIZE or total > PDF_CACHE_MAX_BYTES):
+            _, oud = _pdf_cache.popitem(last=False)
+            total -= len(oud)
+    return data
@@ -1,5 +1,84 @@
+import unicodedata
+
 import streamlit as st
-from pdf_export import create_pdf_from_weekplanning
+from data_loading import meal_keys, per_data_version
+from geo import locatie_coordinaten, nearest_restaurants, route_length, route_order
+from pdf_export import DAGEN_PER_WEEK, weekplanning_pdf_bytes
+
+
+# --- Indexen ---
+# Eén keer per dataversie opgebouwd, zodat elke keuze in de tab een
+# dictionary-lookup is in plaats van een scan over de frames.
+def normaliseer(tekst):
+    # Exacte vergelijking, maar ongevoelig voor hoofdletters en witruimte
+    return " ".join(unicodedata.normalize("NFKC", str(tekst)).split()).casefold()
+
+
+@per_data_version
+def locatie_boom(reizen_df):
+    # land -> regio -> gesorteerde steden; landen en regio's gesorteerd
+    boom = {}
+    locaties = reizen_df[['land', 'regio', 'stad']].astype(str).drop_duplicates()
+    for land, regio, stad in locaties.itertuples(index=False):
+        if not land:
+            continue
+        regios = boom.setdefault(land, {})
+        if not regio:
+            continue
+        steden = regios.setdefault(regio, set())
+        if stad:
+            steden.add(stad)
+    return {
+        land: {regio: sorted(boom[land][regio]) for regio in sorted(boom[land])}
+        for land in sorted(boom)
+    }
+
+
+@per_data_version
+def maaltijd_index(restaurants_df):
+    # (genormaliseerde stad, maaltijd) -> restaurantnamen; stad None = alle steden.
+    # "Ontbijt en lunch" staat onder ontbijt én lunch (zie meal_keys).
+    if 'maaltijd_lijst' not in restaurants_df.columns:
+        return None
+    steden = restaurants_df['stad'].astype(str).map(normaliseer) if 'stad' in restaurants_df.columns else [""] * len(restaurants_df)
+    index = {}
+    for naam, stad, maaltijden in zip(restaurants_df['naam'], steden, restaurants_df['maaltijd_lijst']):
+        for maaltijd in sorted(meal_keys(normaliseer(m) for m in maaltijden)):
+            index.setdefault((stad, maaltijd), []).append(naam)
+            index.setdefault((None, maaltijd), []).append(naam)
+    return index
+
+
+# --- Route ---
+# Zoveel restaurants per maaltijd bij "dichtstbijzijnde"
+DICHTBIJ_AANTAL = 25
+
+
+def herorden_route(weekplanning):
+    # De dagen met coördinaten in een korte route (vertrek blijft de eerste dag
+    # met coördinaten); dagen zonder coördinaten komen achteraan.
+    met = [dag for dag in weekplanning if dag.get("coordinaten")]
+    zonder = [dag for dag in weekplanning if not dag.get("coordinaten")]
+    volgorde = route_order([dag["coordinaten"] for dag in met])
+    return [met[i] for i in volgorde] + zonder
+
+
+def route_km(weekplanning):
+    punten = [dag["coordinaten"] for dag in weekplanning if dag.get("coordinaten")]
+    return route_length(punten, range(len(punten)))
+
+
+def toon_route(weekplanning):
+    if sum(1 for dag in weekplanning if dag.get("coordinaten")) < 3:
+        return
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        st.caption(f"Afstand tussen de bestemmingen: {route_km(weekplanning):.0f} km")
+    with col2:
+        if st.button("Route optimaliseren"):
+            st.session_state['weekplanning'] = herorden_route(weekplanning)
+            st.rerun()
+
 
 # --- Plan je dag tab ---
 def plan_je_dag_tab(reizen_df, restaurants_df):
@@ -8,67 +87,61 @@ def plan_je_dag_tab(reizen_df, restaurants_df):
     if 'weekplanning' not in st.session_state:
         st.session_state['weekplanning'] = []
 
-    # Vul lege waarden op voor data-betrouwbaarheid
-    for col in ['land', 'regio', 'stad']:
-        if col in reizen_df.columns:
-            reizen_df[col] = reizen_df[col].fillna('')
-    for col in ['land', 'regio', 'stad', 'keuken', 'maaltijd']:
-        if col in restaurants_df.columns:
-            restaurants_df[col] = restaurants_df[col].fillna('')
-
-    landen = sorted([l for l in reizen_df['land'].unique() if l])
-    gekozen_land = st.selectbox("Kies land", landen)
+    boom = locatie_boom(reizen_df)
+    gekozen_land = st.selectbox("Kies land", list(boom))
 
-    regios = sorted([r for r in reizen_df[reizen_df['land'] == gekozen_land]['regio'].unique() if r])
-    gekozen_regio = st.selectbox("Kies regio", regios)
+    regios = boom.get(gekozen_land, {})
+    gekozen_regio = st.selectbox("Kies regio", list(regios))
 
     # Altijd een lege default-optie toevoegen
-    steden = sorted([s for s in reizen_df[
-        (reizen_df['land'] == gekozen_land) & (reizen_df['regio'] == gekozen_regio)
-    ]['stad'].unique() if s])
-    steden = [""] + steden
+    steden = [""] + regios.get(gekozen_regio, [])
     gekozen_stad = st.selectbox("Kies stad", steden)
 
     gekozen_locatie = gekozen_stad if isinstance(gekozen_stad, str) else ""
+    punt = locatie_coordinaten(reizen_df).get((str(gekozen_land), str(gekozen_regio or ""), gekozen_locatie))
 
-    # Als er een stad gekozen is, filter; anders alles tonen
-    if gekozen_locatie:
-        restaurants_locatie = restaurants_df[
-            restaurants_df['stad'].str.contains(gekozen_locatie, case=False, na=False, regex=False)
-        ]
-    else:
-        restaurants_locatie = restaurants_df.copy()
-
-    if 'maaltijd' in restaurants_locatie.columns:
-        ontbijt_restaurants = restaurants_locatie[
-            restaurants_locatie['maaltijd'].str.contains("ontbijt", case=False, na=False)
-        ]['naam'].tolist()
-        lunch_restaurants = restaurants_locatie[
-            restaurants_locatie['maaltijd'].str.contains("lunch", case=False, na=False)
-        ]['naam'].tolist()
-        diner_restaurants = restaurants_locatie[
-            restaurants_locatie['maaltijd'].str.contains("diner", case=False, na=False)
-        ]['naam'].tolist()
+    # Als er een stad gekozen is enkel die stad (exact); anders alle restaurants.
+    # Met coördinaten kunnen ook de dichtstbijzijnde restaurants voorgesteld worden.
+    afstanden = {}
+    dichtbij = punt is not None and st.checkbox("Dichtstbijzijnde restaurants voorstellen", key="plan_dichtbij")
+    index = maaltijd_index(restaurants_df)
+    if dichtbij:
+        keuzes = {}
+        for maaltijd in ("ontbijt", "lunch", "diner"):
+            gevonden = nearest_restaurants(restaurants_df, punt[0], punt[1], maaltijd, k=DICHTBIJ_AANTAL)
+            keuzes[maaltijd] = [naam for naam, _ in gevonden]
+            afstanden.update(gevonden)
+        ontbijt_restaurants, lunch_restaurants, diner_restaurants = keuzes["ontbijt"], keuzes["lunch"], keuzes["diner"]
+    elif index is not None:
+        stad_key = normaliseer(gekozen_locatie) if gekozen_locatie else None
+        ontbijt_restaurants = index.get((stad_key, "ontbijt"), [])
+        lunch_restaurants = index.get((stad_key, "lunch"), [])
+        diner_restaurants = index.get((stad_key, "diner"), [])
     else:
         ontbijt_restaurants = lunch_restaurants = diner_restaurants = []
         st.warning("De kolom 'maaltijd' ontbreekt in je restaurantgegevens.")
 
-    ontbijt_keuze = st.selectbox("Ontbijt restaurant", ["- geen -"] + ontbijt_restaurants)
-    lunch_keuze = st.selectbox("Lunch restaurant", ["- geen -"] + lunch_restaurants)
-    diner_keuze = st.selectbox("Diner restaurant", ["- geen -"] + diner_restaurants)
+    def met_afstand(naam):
+        return f"{naam} ({afstanden[naam]:.1f} km)" if naam in afstanden else naam
+
+    ontbijt_keuze = st.selectbox("Ontbijt restaurant", ["- geen -"] + ontbijt_restaurants, format_func=met_afstand)
+    lunch_keuze = st.selectbox("Lunch restaurant", ["- geen -"] + lunch_restaurants, format_func=met_afstand)
+    diner_keuze = st.selectbox("Diner restaurant", ["- geen -"] + diner_restaurants, format_func=met_afstand)
 
     if st.button("Toevoegen aan weekplanning"):
         dag = {
             "bestemming": gekozen_locatie,
             "ontbijt": ontbijt_keuze if ontbijt_keuze != "- geen -" else None,
             "lunch": lunch_keuze if lunch_keuze != "- geen -" else None,
-            "diner": diner_keuze if diner_keuze != "- geen -" else None
+            "diner": diner_keuze if diner_keuze != "- geen -" else None,
+            "coordinaten": list(punt) if punt is not None else None
         }
         st.session_state['weekplanning'].append(dag)
         st.success(f"Dag {len(st.session_state['weekplanning'])} toegevoegd!")
 
     if st.session_state['weekplanning']:
         st.markdown("## Overzicht weekplanning")
+        toon_route(st.session_state['weekplanning'])
         for i, dag in enumerate(st.session_state['weekplanning'], 1):
             st.markdown(f"### Dag {i} - {dag['bestemming']}")
             ontbijt = dag['ontbijt'] or "geen geselecteerd"
@@ -76,10 +149,18 @@ def plan_je_dag_tab(reizen_df, restaurants_df):
             diner = dag['diner'] or "geen geselecteerd"
             st.markdown(f"Ontbijt: {ontbijt}  \nLunch: {lunch}  \nDiner: {diner}")
 
-        pdf_buffer = create_pdf_from_weekplanning(st.session_state['weekplanning'])
+        # De PDF wordt pas gemaakt als er op de knop gedrukt wordt (en per
+        # planning maar één keer), niet bij elke rerun.
+        planning = [dict(dag) for dag in st.session_state['weekplanning']]
+        aantal_weken = -(-len(planning) // DAGEN_PER_WEEK)
+        weken = None
+        if aantal_weken > 1:
+            weken = st.slider("Weken in PDF", 1, aantal_weken, (1, aantal_weken))
+        met_details = st.checkbox("Restaurantdetails en foto's in PDF", value=True)
         st.download_button(
             label="Download PDF",
-            data=pdf_buffer,
+            data=lambda: weekplanning_pdf_bytes(planning, restaurants_df if met_details else None, weken),
             file_name="weekplanning.pdf",
-            mime="application/pdf"
+            mime="application/pdf",
+            on_click="ignore"
         )
@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+
+from data_loading import list_column, per_data_version, read_only
+from filters import combine_masks, search_mask, travel_index, travel_masks
+from instrumentation import span
+from search import search_scores, travel_search_index
+
+# --- Instellingen ---
+# Standaardgewicht per voorkeur; in de sidebar aan te passen
+DEFAULT_WEIGHTS = {
+    'budget': 1.0,
+    'duur': 1.0,
+    'temperatuur': 1.0,
+    'seizoen': 1.0,
+    'vervoersmiddel': 0.5,
+    'reistype': 1.0,
+}
+# Buiten het gekozen bereik zakt een deelscore lineair naar 0 over dit deel
+# van het bereik van de kolom
+TOLERANCE = 0.25
+TOP_K = 50
+# Deze filters worden bij rangschikken voorkeuren in plaats van harde filters
+PREFERENCE_MASKS = (
+    'minimum duur', 'maximum duur', 'budget', 'temperatuur',
+    'seizoen', 'vervoersmiddel', 'reistype / doel',
+)
+
+
+# --- Kenmerken ---
+class TravelFeatures:
+    # Eén keer per dataversie opgebouwd: de numerieke kolommen als float-arrays
+    # en reistype en de ;-kolommen als 0/1-matrices (rij x waarde). Een score
+    # voor de hele catalogus is dan een paar vectorbewerkingen.
+    def __init__(self, df):
+        self.size = len(df)
+        self.numeric = {}
+        for col in ('minimum duur', 'maximum duur', 'budget', 'temperatuur'):
+            if col in df.columns:
+                values = df[col].to_numpy(dtype='float64', na_value=np.nan)
+            else:
+                values = np.full(self.size, np.nan)
+            self.numeric[col] = read_only(values)
+        self.scale = {
+            'budget': _scale(self.numeric['budget']),
+            'temperatuur': _scale(self.numeric['temperatuur']),
+            'duur': _scale(np.concatenate([self.numeric['minimum duur'], self.numeric['maximum duur']])),
+        }
+        self.onehot = {
+            'seizoen': _onehot(df, list_column('seizoen'), tokens=True),
+            'vervoersmiddel': _onehot(df, list_column('vervoersmiddel'), tokens=True),
+            'reistype': _onehot(df, 'reistype / doel'),
+        }
+
+    def _range(self, name, low, high):
+        values = self.numeric[name]
+        gap = np.maximum(low - values, 0) + np.maximum(values - high, 0)
+        return _closeness(gap, self.scale[name])
+
+    def _duur(self, low, high):
+        # Overlap van [minimum duur, maximum duur] van de reis met het gewenste bereik
+        gap = np.maximum(self.numeric['minimum duur'] - high, 0) + np.maximum(low - self.numeric['maximum duur'], 0)
+        return _closeness(gap, self.scale['duur'])
+
+    def _share(self, name, selected):
+        # Deel van de gekozen waarden dat de rij heeft
+        matrix, columns = self.onehot[name]
+        weights = np.zeros(matrix.shape[1], dtype=np.float32)
+        for value in selected:
+            col = columns.get(value.casefold())
+            if col is not None:
+                weights[col] = 1.0 / len(selected)
+        return matrix @ weights
+
+    def scores(self, duur_slider, budget_slider, temp_slider, seizoen, vervoersmiddelen, reistype, weights=None):
+        # Gewogen gemiddelde van de deelscores (elk 0..1). Een lege keuze of
+        # een gewicht 0 telt niet mee; lege cellen scoren 0 op dat deel.
+        weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        parts = {
+            'budget': lambda: self._range('budget', *budget_slider),
+            'duur': lambda: self._duur(*duur_slider),
+            'temperatuur': lambda: self._range('temperatuur', *temp_slider),
+            'seizoen': (lambda: self._share('seizoen', seizoen)) if seizoen else None,
+            'vervoersmiddel': (lambda: self._share('vervoersmiddel', vervoersmiddelen)) if vervoersmiddelen else None,
+            'reistype': (lambda: self._share('reistype', reistype)) if reistype else None,
+        }
+        total = np.zeros(self.size, dtype=np.float32)
+        weight_sum = 0.0
+        for name, part in parts.items():
+            weight = float(weights.get(name, 0))
+            if part is None or weight <= 0:
+                continue
+            total += np.float32(weight) * part()
+            weight_sum += weight
+        if weight_sum:
+            total /= np.float32(weight_sum)
+        return total
+
+
+def _scale(values):
+    finite = values[~np.isnan(values)]
+    return max(float(np.ptp(finite)), 1.0) if len(finite) else 1.0
+
+
+def _closeness(gap, scale):
+    score = np.clip(1 - gap / (TOLERANCE * scale), 0, 1).astype(np.float32)
+    score[np.isnan(gap)] = 0
+    return score
+
+
+def _onehot(df, col, tokens=False):
+    # (matrix rij x waarde, waarde in kleine letters -> kolom)
+    size = len(df)
+    if col not in df.columns:
+        return read_only(np.zeros((size, 0), dtype=np.float32)), {}
+    if tokens:
+        lengths = df[col].map(len).to_numpy()
+        keys = np.array([t.casefold() for items in df[col] for t in items], dtype=object)
+        rows = np.repeat(np.arange(size), lengths)
+    else:
+        values = df[col].astype(object)
+        keys = values.where(values.notna(), None).map(lambda v: v if v is None else str(v).casefold()).to_numpy()
+        rows = np.arange(size)
+    codes, uniques = pd.factorize(keys)
+    valid = codes >= 0
+    matrix = np.zeros((size, len(uniques)), dtype=np.float32)
+    matrix[rows[valid], codes[valid]] = 1.0
+    return read_only(matrix), {key: i for i, key in enumerate(uniques)}
+
+
+@per_data_version
+def travel_features(df):
+    with span("ranking_features", rows=len(df)):
+        return TravelFeatures(df)
+
+
+# --- Rangschikken ---
+def top_k(scores, k, rows=None):
+    # De k beste rijposities, hoogste score eerst en bij gelijke score de
+    # originele volgorde, zonder de hele lijst te sorteren
+    rows = np.arange(len(scores)) if rows is None else rows
+    values = scores[rows]
+    if k < len(rows):
+        kth = np.partition(values, len(values) - k)[len(values) - k]
+        keep = values > kth
+        keep[np.flatnonzero(values == kth)[:k - np.count_nonzero(keep)]] = True
+        rows, values = rows[keep], values[keep]
+    return rows[np.argsort(-values, kind='stable')]
+
+
+def without_preferences(masks):
+    return {name: None if name in PREFERENCE_MASKS else mask for name, mask in masks.items()}
+
+
+def rank_travel_in_memory(df, duur_slider, budget_slider, continent, reistype, seizoen, accommodatie, temp_slider, vervoersmiddelen, land, regio, stad, zoekterm='', weights=None, k=TOP_K):
+    # Zoals filter_travel_in_memory, maar budget, duur, temperatuur, seizoen,
+    # vervoersmiddel en reistype wegen mee in een score in plaats van te
+    # filteren. Geeft (de k best passende rijen met kolom 'match' in %, aantal kandidaten).
+    with span("rank_travel", rows_in=len(df)) as s:
+        index = travel_index(df)
+        search = search_scores(travel_search_index(df), zoekterm) if zoekterm.strip() else None
+        masks = search_mask(without_preferences(travel_masks(index, duur_slider, budget_slider, continent, reistype, seizoen, accommodatie, temp_slider, vervoersmiddelen, land, regio, stad)), search)
+        candidates = np.flatnonzero(combine_masks(index, masks.values()))
+        scores = travel_features(df).scores(duur_slider, budget_slider, temp_slider, seizoen, vervoersmiddelen, reistype, weights)
+        rows = top_k(scores, k, candidates)
+        ranked = df.iloc[rows].assign(match=np.rint(scores[rows] * 100).astype(np.int64))
+        s.set(rows_out=len(ranked), candidates=len(candidates))
+    return ranked, len(candidates)
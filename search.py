@@ -0,0 +1,260 @@
+import bisect
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from data_loading import per_data_version, read_only
+from instrumentation import record_cache, span
+
+# --- Instellingen ---
+# Gewicht per doorzocht veld: een treffer in de naam telt meer dan in een opmerking
+TRAVEL_SEARCH_FIELDS = [
+    ('naam', 3.0), ('stad', 2.5), ('regio', 2.0), ('land', 2.0),
+    ('reistype / doel', 1.5), ('opmerking', 1.0),
+]
+RESTAURANT_SEARCH_FIELDS = [
+    ('naam', 3.0), ('keuken', 2.5), ('stad', 2.5), ('regio', 2.0), ('land', 2.0),
+    ('opmerking', 1.0),
+]
+# Score per soort match van een zoekterm op een token
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.8
+FUZZY_SCORE = {1: 0.6, 2: 0.4}
+# Minimale Dice-overlap van trigrammen voor een kandidaat met tikfout
+MIN_TRIGRAM_OVERLAP = 0.3
+MAX_PREFIX_MATCHES = 50
+# Zoveel recente zoektermen per index houden hun scores bij
+SCORES_CACHE_SIZE = 16
+
+_WORD = re.compile(r"\w+")
+
+
+# --- Tokens ---
+def normalize_text(text):
+    # Hoofdletters en accenten tellen niet mee: "Italië" -> "italie"
+    text = str(text)
+    if text.isascii():
+        return text.casefold()
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def tokenize(text):
+    return _WORD.findall(normalize_text(text))
+
+
+def _trigrams(token):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_edits(term):
+    return 0 if len(term) < 4 else 1 if len(term) < 8 else 2
+
+
+def edit_distance(a, b, limit):
+    # Damerau-Levenshtein (aangrenzende wissels), afgebroken zodra limit overschreden is
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if previous2 is not None and i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+# --- Zoekindex ---
+class SearchIndex:
+    # Eén keer per dataversie opgebouwd: per token de rijen (met het gewicht van
+    # het beste veld) en per trigram de tokens, voor zoektermen met tikfouten.
+    # Een vorige index geeft zijn tokenisatie per rij en trigrammen per token
+    # mee, zodat na een refresh enkel gewijzigde rijen opnieuw getokeniseerd worden.
+    def __init__(self, df, fields, previous=None):
+        self.size = len(df)
+        fields = [(col, weight) for col, weight in fields if col in df.columns]
+        row_cache = previous.row_tokens if previous is not None else {}
+        trigram_cache = previous.token_trigrams if previous is not None else {}
+
+        texts = zip(*[_column_text(df, col) for col, _ in fields]) if fields else iter(())
+        self.row_tokens = {}
+        # Land, regio, stad, ... herhalen zich: elke waarde maar één keer tokeniseren
+        value_tokens = {}
+        tokens_flat, rows_flat, weights_flat = [], [], []
+        for row, text in enumerate(texts):
+            tokens = self.row_tokens.get(text)
+            if tokens is None:
+                tokens = row_cache.get(text)
+                if tokens is None:
+                    tokens = _row_tokens(text, [weight for _, weight in fields], value_tokens)
+                self.row_tokens[text] = tokens
+            for token, weight in tokens:
+                tokens_flat.append(token)
+                rows_flat.append(row)
+                weights_flat.append(weight)
+
+        codes, vocabulary = pd.factorize(np.array(tokens_flat, dtype=object))
+        self.vocabulary = list(vocabulary)
+        self.token_ids = {token: i for i, token in enumerate(self.vocabulary)}
+        self.sorted_vocabulary = sorted(self.vocabulary)
+        self.postings = _group(codes, np.array(rows_flat, dtype=np.int64), np.array(weights_flat, dtype=np.float32), len(self.vocabulary))
+
+        self.token_trigrams = {}
+        trigram_ids = {}
+        for i, token in enumerate(self.vocabulary):
+            trigrams = trigram_cache.get(token) or _trigrams(token)
+            self.token_trigrams[token] = trigrams
+            for trigram in trigrams:
+                trigram_ids.setdefault(trigram, []).append(i)
+        self.trigram_postings = {t: read_only(np.array(ids, dtype=np.int64)) for t, ids in trigram_ids.items()}
+        self.trigram_counts = read_only(np.array([len(self.token_trigrams[t]) for t in self.vocabulary], dtype=np.int64))
+        self._scores_cache = OrderedDict()
+        self._scores_lock = threading.Lock()
+
+    def matches(self, term):
+        # token-id -> matchscore voor één zoekterm: exact, prefix of met tikfouten
+        found = {}
+        if term in self.token_ids:
+            found[self.token_ids[term]] = EXACT_SCORE
+        if len(term) >= 2:
+            start = bisect.bisect_left(self.sorted_vocabulary, term)
+            for token in self.sorted_vocabulary[start:start + MAX_PREFIX_MATCHES]:
+                if not token.startswith(term):
+                    break
+                found.setdefault(self.token_ids[token], PREFIX_SCORE)
+        limit = max_edits(term)
+        if limit:
+            for token_id, distance in self._fuzzy(term, limit):
+                found.setdefault(token_id, FUZZY_SCORE[distance])
+        return found
+
+    def _fuzzy(self, term, limit):
+        trigrams = _trigrams(term)
+        hits = [self.trigram_postings[t] for t in trigrams if t in self.trigram_postings]
+        if not hits:
+            return []
+        shared = np.bincount(np.concatenate(hits), minlength=len(self.vocabulary))
+        dice = 2 * shared / (len(trigrams) + self.trigram_counts)
+        candidates = np.flatnonzero(dice >= MIN_TRIGRAM_OVERLAP)
+        result = []
+        for token_id in candidates:
+            distance = edit_distance(term, self.vocabulary[token_id], limit)
+            if 0 < distance <= limit:
+                result.append((int(token_id), distance))
+        return result
+
+    def cached_scores(self, query):
+        with self._scores_lock:
+            scores = self._scores_cache.get(query)
+            if scores is not None:
+                self._scores_cache.move_to_end(query)
+        record_cache("search_scores", scores is not None)
+        if scores is None:
+            scores = read_only(self.scores(query))
+            with self._scores_lock:
+                self._scores_cache[query] = scores
+                while len(self._scores_cache) > SCORES_CACHE_SIZE:
+                    self._scores_cache.popitem(last=False)
+        return scores
+
+    def scores(self, query):
+        # Score per rij (0 = geen match). Elke zoekterm moet ergens matchen;
+        # per term telt het beste token, gewogen naar het veld.
+        terms = list(dict.fromkeys(tokenize(query)))
+        total = np.zeros(self.size, dtype=np.float32)
+        if not terms:
+            return total
+        matched = np.ones(self.size, dtype=bool)
+        for term in terms:
+            term_scores = np.zeros(self.size, dtype=np.float32)
+            for token_id, match in self.matches(term).items():
+                rows, weights = self.postings[token_id]
+                np.maximum.at(term_scores, rows, match * weights)
+            matched &= term_scores > 0
+            if not matched.any():
+                break
+            total += term_scores
+        total[~matched] = 0
+        return total
+
+
+def _column_text(df, col):
+    values = df[col].astype(object)
+    return values.where(values.notna(), '').astype(str).tolist()
+
+
+def _row_tokens(text, weights, value_tokens):
+    best = {}
+    for value, weight in zip(text, weights):
+        tokens = value_tokens.get(value)
+        if tokens is None:
+            tokens = value_tokens[value] = tokenize(value)
+        for token in tokens:
+            if best.get(token, 0) < weight:
+                best[token] = weight
+    return tuple(best.items())
+
+
+def _group(codes, rows, weights, n):
+    # Per token-id (0..n-1) een tuple (rijen, gewichten)
+    if n == 0:
+        return []
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(1, n))
+    return [
+        (read_only(r), read_only(w))
+        for r, w in zip(np.split(rows[order], bounds), np.split(weights[order], bounds))
+    ]
+
+
+# --- Per dataset ---
+# De laatst gebouwde index per dataset dient als basis voor de volgende versie
+_previous = {}
+_previous_lock = threading.Lock()
+
+
+def _build(name, df, fields):
+    with span("search_index", rows=len(df)):
+        with _previous_lock:
+            previous = _previous.get(name)
+        index = SearchIndex(df, fields, previous)
+        with _previous_lock:
+            _previous[name] = index
+    return index
+
+
+@per_data_version
+def travel_search_index(df):
+    return _build('reizen', df, TRAVEL_SEARCH_FIELDS)
+
+
+@per_data_version
+def restaurants_search_index(df):
+    return _build('restaurants', df, RESTAURANT_SEARCH_FIELDS)
+
+
+def search_scores(index, query):
+    # Facetaantallen en filter vragen binnen één rerun dezelfde scores op;
+    # het resultaat is alleen-lezen en wordt op de index zelf bewaard, zodat
+    # het samen met een vervangen index verdwijnt.
+    with span("search", query_len=len(query)) as s:
+        scores = index.cached_scores(" ".join(tokenize(query)))
+        s.set(rows_out=int(np.count_nonzero(scores)))
+    return scores
+
+
+def rank_rows(rows, scores):
+    # Rijposities op relevantie (hoogste eerst); bij gelijke score de originele volgorde
+    if scores is None:
+        return rows
+    return rows[np.argsort(-scores[rows], kind='stable')]
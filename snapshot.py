@@ -0,0 +1,44 @@
+import logging
+import os
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# --- Lokale snapshot (Parquet) ---
+# De geparste frames worden kolomsgewijs met hun dtypes op schijf bewaard, zodat
+# een herstart meteen data heeft, ook zonder netwerk.
+SNAPSHOT_DIR = os.environ.get(
+    "ZWW_SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(__file__), ".snapshot")
+)
+
+
+def snapshot_path(name):
+    return os.path.join(SNAPSHOT_DIR, f"{name}.parquet")
+
+
+def write_snapshot(name, df):
+    # Eerst naar een tijdelijk bestand, dan atomair vervangen: een lezer ziet
+    # nooit een half geschreven snapshot.
+    path = snapshot_path(name)
+    tmp_path = f"{path}.tmp"
+    try:
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.warning("Snapshot %s niet geschreven: %s", name, e)
+
+
+def read_snapshot(name):
+    # Geeft None terug als er (nog) geen bruikbare snapshot is.
+    # data_version zit in de attrs en overleeft de round trip via Parquet.
+    path = snapshot_path(name)
+    if not os.path.exists(path):
+        return None
+    try:
+        return pd.read_parquet(path, memory_map=True)
+    except Exception as e:
+        logger.warning("Snapshot %s niet leesbaar: %s", name, e)
+        return None
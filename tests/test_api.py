@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+import pytest
+
+import api
+from benchmark import generate_restaurant_values, generate_travel_values
+from data_loading import parse_restaurants_values, parse_travel_values
+
+TRAVEL_DF = parse_travel_values(generate_travel_values(200, seed=3))
+RESTAURANTS_DF = parse_restaurants_values(generate_restaurant_values(100, seed=3))
+DAG = {"bestemming": "Florence", "ontbijt": None, "lunch": None, "diner": None}
+
+
+@pytest.fixture(autouse=True)
+def frames(monkeypatch):
+    async def _frames():
+        return TRAVEL_DF, RESTAURANTS_DF
+
+    monkeypatch.setattr(api, "_frames", _frames)
+    monkeypatch.setattr(api, "_responses", api.ResponseCache(api.RESPONSE_CACHE_SIZE))
+
+
+def call(method, path, query="", headers=None, body=None):
+    # Eén request rechtstreeks naar de ASGI-app; geeft (status, headers, body)
+    payload = json.dumps(body).encode() if body is not None else b""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': method, 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'root_path': '', 'query_string': query.encode(), 'server': ('test', 80), 'client': ('test', 1),
+        'headers': [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+    }
+    messages = [{'type': 'http.request', 'body': payload, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(api.app(scope, receive, send))
+    start = sent[0]
+    response_headers = {k.decode(): v.decode() for k, v in start['headers']}
+    return start['status'], response_headers, b"".join(m.get('body', b'') for m in sent[1:])
+
+
+def test_repeated_request_with_etag_is_not_modified():
+    status, headers, body = call('GET', '/reizen', 'budget_max=3000&page_size=5')
+    assert status == 200
+    assert json.loads(body)['page_size'] == 5
+    etag = headers['etag']
+
+    status, headers, body = call('GET', '/reizen', 'budget_max=3000&page_size=5', {'If-None-Match': etag})
+    assert status == 304 and body == b""
+    assert headers['etag'] == etag
+
+    # Een andere query heeft een andere ETag
+    status, headers, _ = call('GET', '/reizen', 'budget_max=2000&page_size=5', {'If-None-Match': etag})
+    assert status == 200 and headers['etag'] != etag
+
+
+def test_pdf_for_a_valid_week_range():
+    status, headers, body = call('POST', '/pdf', body={'weekplanning': [DAG] * 8, 'weken': [2, 2], 'details': False})
+    assert status == 200
+    assert body.startswith(b"%PDF")
+
+
+@pytest.mark.parametrize("body", [
+    {'weekplanning': []},
+    {'weekplanning': [DAG], 'weken': "12"},
+    {'weekplanning': [DAG], 'weken': [1]},
+    {'weekplanning': [DAG], 'weken': [1, "1"]},
+    {'weekplanning': [DAG], 'weken': [1.0, 1.0]},
+    {'weekplanning': [DAG], 'weken': [2, 1]},
+    {'weekplanning': [DAG], 'weken': [3, 4]},
+    {'weekplanning': [DAG] * 8, 'weken': [1, 3]},
+])
+def test_invalid_pdf_requests_are_rejected(body):
+    status, _, response = call('POST', '/pdf', body=body)
+    assert status == 400
+    assert 'error' in json.loads(response)
@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+
+from benchmark import generate_travel_values
+from data_loading import (
+    IncrementalSheet, RESTAURANTS_RANGE, TRAVEL_RANGE, TRAVEL_SCHEMA,
+    list_column, parse_travel_values
+)
+from gsheets_service import FakeSheetsTransport, batch_get_values, set_sheets_transport
+
+REIZEN = [
+    ["Land", "Regio", "Stad", "Budget", "Seizoen", "Minimum duur"],
+    ["Italië", "Toscane", "Florence", "1200", "Lente; Zomer", "5"],
+    ["Frankrijk", "", "Parijs", "", "Herfst", "x"],
+]
+RESTAURANTS = [
+    ["Naam", "Stad", "Maaltijd"],
+    ["Trattoria", "Florence", "Lunch;Diner"],
+]
+
+
+@pytest.fixture
+def transport():
+    transport = FakeSheetsTransport({"Opties": REIZEN, "Restaurants": RESTAURANTS})
+    set_sheets_transport(transport)
+    yield transport
+    set_sheets_transport(None)
+
+
+def test_batch_get_through_fake_transport(transport):
+    reizen, restaurants = batch_get_values([TRAVEL_RANGE, RESTAURANTS_RANGE])
+    assert transport.calls == 1
+    assert reizen == REIZEN
+    assert restaurants == RESTAURANTS
+
+    df = parse_travel_values(reizen)
+    assert list(df['stad']) == ["Florence", "Parijs"]
+    assert df['budget'].dtype == 'float64'
+    assert df['budget'].iloc[0] == 1200 and pd.isna(df['budget'].iloc[1])
+    assert pd.isna(df['minimum duur'].iloc[1])
+    assert list(df[list_column('seizoen')]) == [("Lente", "Zomer"), ("Herfst",)]
+
+
+def test_incremental_patch_matches_full_parse():
+    values = [list(row) for row in generate_travel_values(300, seed=1)]
+    sheet = IncrementalSheet(parse_travel_values, TRAVEL_SCHEMA)
+    sheet.update(values)
+
+    changed = [list(row) for row in values]
+    changed[5][10] = "9999"
+    changed[42][2] = "Nieuwe stad"
+    del changed[100]
+    changed.insert(7, list(values[200]))
+    patched = sheet.update(changed)
+
+    full = parse_travel_values(changed)
+    pd.testing.assert_frame_equal(patched.reset_index(drop=True), full.reset_index(drop=True))
+    assert patched.attrs['data_version'] == sheet.version
+
+
+def test_unchanged_values_keep_the_same_frame():
+    values = [list(row) for row in generate_travel_values(50)]
+    sheet = IncrementalSheet(parse_travel_values, TRAVEL_SCHEMA)
+    first = sheet.update(values)
+    assert sheet.update([list(row) for row in values]) is first
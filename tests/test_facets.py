@@ -0,0 +1,67 @@
+import random
+
+import numpy as np
+import pytest
+
+from benchmark import generate_travel_values
+from data_loading import list_column, parse_travel_values
+from facets import clamp_range, facet_counts, travel_facets
+from filters import combine_masks, travel_index, travel_masks
+
+TRAVEL_DF = parse_travel_values(generate_travel_values(600, seed=5))
+# Zoals na het laden: met een dataversie worden facetten per versie bewaard
+TRAVEL_DF.attrs['data_version'] = "test-facetten"
+CATEGORICAL = ['continent', 'reistype / doel', 'accommodatie', 'land', 'regio', 'stad']
+TOKENS = ['seizoen', 'vervoersmiddel']
+
+
+def _query(rng, facets):
+    def kies(col, k=2):
+        return rng.sample(facets[col], rng.randint(0, min(k, len(facets[col]))))
+
+    low_b, high_b = facets['budget']
+    return (
+        facets['duur'], (rng.randint(low_b, high_b // 2), rng.randint(high_b // 2, high_b)),
+        kies('continent'), kies('reistype / doel'), kies('seizoen'), kies('accommodatie'),
+        facets['temperatuur'], kies('vervoersmiddel'), kies('land', 3), [], [],
+    )
+
+
+def _expected(df, index, masks, col):
+    # Referentie: value_counts op het frame gefilterd met alle andere filters
+    others = df[combine_masks(index, [m for name, m in masks.items() if name != col])]
+    if col in TOKENS:
+        labels = index.token_labels[col]
+        tokens = others[list_column(col)].map(lambda items: sorted({t.casefold() for t in items})).explode()
+        counts = tokens.dropna().map(labels).value_counts()
+        keys = labels.values()
+    else:
+        counts = others[col].astype(object).value_counts()
+        keys = index.postings[col]
+    return {key: int(counts.get(key, 0)) for key in keys}
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_facet_counts_equal_value_counts_on_the_filtered_frame(seed):
+    facets = travel_facets(TRAVEL_DF)
+    index = travel_index(TRAVEL_DF)
+    masks = travel_masks(index, *_query(random.Random(seed), facets))
+    counts = facet_counts(index, masks)
+    assert set(counts) == set(CATEGORICAL + TOKENS)
+    for col in CATEGORICAL + TOKENS:
+        assert counts[col] == _expected(TRAVEL_DF, index, masks, col), col
+
+
+def test_facet_options_and_bounds():
+    facets = travel_facets(TRAVEL_DF)
+    assert facets['land'] == sorted(TRAVEL_DF['land'].astype(object).unique())
+    assert facets['seizoen'] == sorted({t for items in TRAVEL_DF[list_column('seizoen')] for t in items})
+    assert facets['budget'] == (int(TRAVEL_DF['budget'].min()), int(TRAVEL_DF['budget'].max()))
+    assert facets['duur'] == (int(TRAVEL_DF['minimum duur'].min()), int(TRAVEL_DF['maximum duur'].max()))
+    assert travel_facets(TRAVEL_DF) is facets
+
+
+def test_clamp_range():
+    assert clamp_range(None, (0, 10)) == (0, 10)
+    assert clamp_range((-5, 4), (0, 10)) == (0, 4)
+    assert clamp_range((20, 30), (0, 10)) == (10, 10)
@@ -0,0 +1,166 @@
+import random
+
+import numpy as np
+import pytest
+
+from benchmark import SEIZOENEN, VERVOERSMIDDELEN, generate_restaurant_values, generate_travel_values
+from data_loading import parse_restaurants_values, parse_travel_values
+from filters import combine_masks, restaurant_masks, restaurants_index, travel_index, travel_masks
+
+
+def _with_gaps(values, columns, rng, share=0.1):
+    # Een deel van de cellen leeg maken, en de ;-kolommen soms in kleine letters
+    header = values[0]
+    rows = [list(row) + [''] * (len(header) - len(row)) for row in values[1:]]
+    for row in rows:
+        for col in columns:
+            i = header.index(col)
+            if rng.random() < share:
+                row[i] = ''
+            elif col in ('Seizoen', 'Vervoersmiddel') and rng.random() < share:
+                row[i] = row[i].lower()
+    return [header] + rows
+
+
+rng = random.Random(7)
+TRAVEL_DF = parse_travel_values(_with_gaps(
+    generate_travel_values(400, seed=7),
+    ['Minimum duur', 'Maximum duur', 'Budget', 'Temperatuur', 'Seizoen', 'Vervoersmiddel', 'Continent'],
+    rng,
+))
+RESTAURANTS_DF = parse_restaurants_values(_with_gaps(generate_restaurant_values(300, seed=7), ['Prijs', 'Keuken'], rng))
+
+
+# --- Referentie: gewone pandas-filters ---
+def _range(col, low, high):
+    # Ontbrekende grens = onbegrensd; lege cellen vallen altijd weg
+    keep = col.notna()
+    if low is not None:
+        keep &= col >= low
+    if high is not None:
+        keep &= col <= high
+    return keep
+
+
+def _reference_travel(df, duur, budget, continent, reistype, seizoen, accommodatie, temp, vervoersmiddelen, land, regio, stad):
+    keep = (
+        _range(df['minimum duur'], duur[0], None)
+        & _range(df['maximum duur'], None, duur[1])
+        & _range(df['budget'], *budget)
+        & _range(df['temperatuur'], *temp)
+    )
+    for col, values in (('continent', continent), ('reistype / doel', reistype), ('accommodatie', accommodatie),
+                        ('land', land), ('regio', regio), ('stad', stad)):
+        if values:
+            keep &= df[col].astype(object).isin(values)
+    # Zoals de oorspronkelijke filter: deeltekst, hoofdletterongevoelig
+    for col, values in (('seizoen', seizoen), ('vervoersmiddel', vervoersmiddelen)):
+        if values:
+            keep &= df[col].str.contains('|'.join(values), case=False, na=False)
+    return np.flatnonzero(keep.to_numpy())
+
+
+def _reference_restaurants(df, keuken, prijs, land, regio, stad):
+    keep = _range(df['prijs'], *prijs)
+    for col, values in (('keuken', keuken), ('land', land), ('regio', regio), ('stad', stad)):
+        if values:
+            keep &= df[col].astype(object).isin(values)
+    return np.flatnonzero(keep.to_numpy())
+
+
+def _bounds(rng, values):
+    # (laag, hoog): een bestaande waarde, iets ertussen of een open grens, en
+    # soms een omgekeerd (leeg) bereik
+    values = sorted(values)
+
+    def bound(lo, hi):
+        kind = rng.random()
+        if kind < 0.25:
+            return None
+        if kind < 0.6:
+            return float(values[int(rng.uniform(lo, hi) * (len(values) - 1))])
+        return values[0] + rng.uniform(lo, hi) * (values[-1] - values[0])
+
+    low, high = bound(0, 0.5), bound(0.5, 1)
+    return (high, low) if rng.random() < 0.05 else (low, high)
+
+
+def _choose(rng, values, k=3, share=0.5):
+    # Met kans share geen filter, anders 1..k waarden
+    values = sorted({v for v in values if v})
+    if rng.random() < share:
+        return []
+    return rng.sample(values, rng.randint(1, min(k, len(values))))
+
+
+def _travel_query(rng, df):
+    numbers = {col: df[col].dropna().tolist() for col in ('minimum duur', 'maximum duur', 'budget', 'temperatuur')}
+    duur = _bounds(rng, numbers['minimum duur'] + numbers['maximum duur'])
+    return (
+        duur,
+        _bounds(rng, numbers['budget']),
+        _choose(rng, df['continent'].astype(object).dropna()),
+        _choose(rng, df['reistype / doel']),
+        _choose(rng, SEIZOENEN + [s.lower() for s in SEIZOENEN]),
+        _choose(rng, df['accommodatie']),
+        _bounds(rng, numbers['temperatuur']),
+        _choose(rng, VERVOERSMIDDELEN),
+        _choose(rng, df['land'].astype(object), 8, share=0.7),
+        _choose(rng, df['regio'].astype(object), 20, share=0.8),
+        _choose(rng, df['stad'].astype(object), 60, share=0.9),
+    )
+
+
+# --- Tests ---
+@pytest.mark.parametrize("seed", range(300))
+def test_travel_index_matches_pandas(seed):
+    query = _travel_query(random.Random(seed), TRAVEL_DF)
+    index = travel_index(TRAVEL_DF)
+    rows = np.flatnonzero(combine_masks(index, travel_masks(index, *query).values()))
+    np.testing.assert_array_equal(rows, _reference_travel(TRAVEL_DF, *query))
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_restaurants_index_matches_pandas(seed):
+    rng = random.Random(seed)
+    prijzen = RESTAURANTS_DF['prijs'].dropna().tolist()
+    query = (
+        _choose(rng, RESTAURANTS_DF['keuken'].astype(object).dropna()),
+        _bounds(rng, prijzen),
+        _choose(rng, RESTAURANTS_DF['land'].astype(object), 8, share=0.7),
+        _choose(rng, RESTAURANTS_DF['regio'].astype(object), 20, share=0.8),
+        _choose(rng, RESTAURANTS_DF['stad'].astype(object), 60, share=0.9),
+    )
+    index = restaurants_index(RESTAURANTS_DF)
+    rows = np.flatnonzero(combine_masks(index, restaurant_masks(index, *query).values()))
+    np.testing.assert_array_equal(rows, _reference_restaurants(RESTAURANTS_DF, *query))
+
+
+def test_ranges_with_open_empty_and_inverted_bounds():
+    index = travel_index(TRAVEL_DF)
+    budget = TRAVEL_DF['budget']
+    # Zonder grenzen vallen enkel de lege cellen weg
+    assert index.select_range('budget').sum() == budget.notna().sum()
+    # Grenzen zijn inclusief
+    waarde = budget.dropna().iloc[0]
+    assert index.select_range('budget', waarde, waarde).sum() == (budget == waarde).sum()
+    # Een leeg bereik geeft geen rijen
+    assert not index.select_range('budget', 500, 100).any()
+    # Een onbekende kolom filtert niet
+    assert index.select_range('bestaat niet', 0, 1) is None
+
+
+def test_list_columns_match_any_token_case_insensitively():
+    df = parse_travel_values([
+        ["Land", "Seizoen", "Vervoersmiddel"],
+        ["Italië", "Lente; Zomer", "Trein"],
+        ["Spanje", "zomer", "Auto;Trein"],
+        ["Noorwegen", "Winter", ""],
+        ["Japan", "", "Vliegtuig"],
+    ])
+    index = travel_index(df)
+    assert list(np.flatnonzero(index.select_tokens('seizoen', ["Zomer"]))) == [0, 1]
+    assert list(np.flatnonzero(index.select_tokens('seizoen', ["ZOMER", "winter"]))) == [0, 1, 2]
+    assert list(np.flatnonzero(index.select_tokens('vervoersmiddel', ["Trein"]))) == [0, 1]
+    assert not index.select_tokens('vervoersmiddel', ["Boot"]).any()
+    assert index.select_tokens('seizoen', []) is None
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from geo import KDTree, RestaurantGeoIndex, chord_to_km, distance_km, route_length, route_order, unit_vectors
+
+
+def _random_points(rng, n):
+    lat = np.degrees(np.arcsin(rng.uniform(-1, 1, n)))
+    lon = rng.uniform(-180, 180, n)
+    return lat, lon
+
+
+@pytest.mark.parametrize("n, k", [(1, 1), (50, 1), (500, 5), (2000, 30), (100, 150)])
+def test_kdtree_matches_brute_force(n, k):
+    rng = np.random.default_rng(n)
+    points = unit_vectors(*_random_points(rng, n))
+    tree = KDTree(points, leaf_size=8)
+    for query in unit_vectors(*_random_points(rng, 20)):
+        rows, chords = tree.query(query, k)
+        expected = np.argsort(np.linalg.norm(points - query, axis=1), kind='stable')[:k]
+        np.testing.assert_array_equal(rows, expected)
+        np.testing.assert_allclose(chords, np.linalg.norm(points[expected] - query, axis=1))
+
+
+def test_kdtree_empty():
+    rows, chords = KDTree(np.empty((0, 3))).query([1.0, 0.0, 0.0], 3)
+    assert len(rows) == len(chords) == 0
+
+
+def test_distances_in_km():
+    # Brussel - Parijs is ongeveer 264 km
+    assert distance_km((50.85, 4.35), (48.86, 2.35)) == pytest.approx(264, abs=3)
+    assert chord_to_km(2.0) == pytest.approx(np.pi * 6371.0)
+
+
+def test_nearest_restaurants_per_meal():
+    rng = np.random.default_rng(1)
+    lat, lon = rng.uniform(40, 55, 300), rng.uniform(-5, 20, 300)
+    maaltijden = [("Ontbijt",), ("Lunch", "Diner"), ("Ontbijt en lunch",), ()]
+    df = pd.DataFrame({
+        'naam': [f"R{i}" for i in range(300)],
+        'lat': lat, 'lon': lon,
+        'maaltijd_lijst': [maaltijden[i % 4] for i in range(300)],
+    })
+    df.loc[5, 'lat'] = np.nan
+    index = RestaurantGeoIndex(df)
+
+    found = index.nearest(50.0, 5.0, "lunch", k=10)
+    km = np.array([distance_km((50.0, 5.0), (a, b)) for a, b in zip(lat, lon)])
+    lunch = [i for i in range(300) if i % 4 in (1, 2)]
+    expected = sorted(lunch, key=lambda i: km[i])[:10]
+    assert [naam for naam, _ in found] == [f"R{i}" for i in expected]
+    assert [d for _, d in found] == pytest.approx(km[expected], abs=1e-6)
+    assert "R5" not in dict(index.nearest(lat[5], lon[5], k=300))
+    assert index.nearest(50.0, 5.0, "brunch") == []
+
+
+@pytest.mark.parametrize("n", [3, 4, 8, 15, 30])
+def test_route_is_never_longer_than_the_given_order(n):
+    for seed in range(10):
+        rng = np.random.default_rng(100 * n + seed)
+        points = np.column_stack(_random_points(rng, n))
+        order = route_order(points)
+        assert sorted(order) == list(range(n)) and order[0] == 0
+        assert route_length(points, order) <= route_length(points, range(n)) + 1e-9
@@ -0,0 +1,29 @@
+import pytest
+
+from data_loading import RESTAURANTS_RANGE, TRAVEL_RANGE
+from gsheets_service import LocalFileTransport, SheetNotFoundError
+
+OPTIES = [["Land", "Stad"], ["Italië", "Florence"], ["Frankrijk", ""]]
+
+
+def test_csv_directory(tmp_path):
+    (tmp_path / "Opties.csv").write_text("Land,Stad\nItalië,Florence\nFrankrijk,\n", encoding='utf-8')
+    assert LocalFileTransport(str(tmp_path)).batch_get([TRAVEL_RANGE]) == [OPTIES]
+
+
+def test_missing_csv_tab_names_the_tab(tmp_path):
+    (tmp_path / "Opties.csv").write_text("Land,Stad\n", encoding='utf-8')
+    with pytest.raises(SheetNotFoundError, match="Restaurants"):
+        LocalFileTransport(str(tmp_path)).batch_get([TRAVEL_RANGE, RESTAURANTS_RANGE])
+
+
+def test_xlsx_workbook_and_missing_tab(tmp_path):
+    pytest.importorskip("openpyxl")
+    import pandas as pd
+
+    path = str(tmp_path / "reizen.xlsx")
+    pd.DataFrame(OPTIES).to_excel(path, sheet_name="Opties", header=False, index=False)
+    transport = LocalFileTransport(path)
+    assert transport.batch_get([TRAVEL_RANGE]) == [OPTIES]
+    with pytest.raises(SheetNotFoundError, match="Restaurants"):
+        transport.batch_get([RESTAURANTS_RANGE])
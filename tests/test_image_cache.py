@@ -0,0 +1,158 @@
+import io
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from PIL import Image
+
+import image_cache
+import instrumentation
+from image_cache import (
+    DiskImageCache, MemoryLRU, fetch_thumbnail, image_sources, make_thumbnail, prefetch_images
+)
+
+ETAG = '"v1"'
+
+
+def _png(width, height):
+    out = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 30, 30)).save(out, format='PNG')
+    return out.getvalue()
+
+
+# --- Lokale HTTP-server ---
+class ImageHandler(BaseHTTPRequestHandler):
+    # /foto.png met ETag (If-None-Match geeft 304), /pagina.html, /traag (antwoordt
+    # pas na de read-timeout) en al de rest 404. Elk verzoek wordt bijgehouden.
+    routes = {
+        '/foto.png': ('image/png', _png(800, 600)),
+        '/pagina.html': ('text/html', b"<html>niet gevonden</html>"),
+    }
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get('If-None-Match')))
+        if self.path == '/traag':
+            time.sleep(1)
+        if self.path not in self.routes:
+            self.send_error(404)
+            return
+        if self.headers.get('If-None-Match') == ETAG:
+            self.send_response(304)
+            self.send_header('ETag', ETAG)
+            self.end_headers()
+            return
+        mime, body = self.routes[self.path]
+        self.send_response(200)
+        self.send_header('Content-Type', mime)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', ETAG)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), ImageHandler)
+    httpd.daemon_threads = True
+    httpd.requests = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def caches(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_cache, "_disk_cache", DiskImageCache(str(tmp_path), 10 * 1024 * 1024))
+    monkeypatch.setattr(image_cache, "_memory_cache", MemoryLRU(1024 * 1024))
+    monkeypatch.setattr(image_cache, "_failures", OrderedDict())
+    monkeypatch.setattr(image_cache, "FETCH_TIMEOUT", (1, 0.3))
+
+
+# --- Thumbnails ---
+def test_thumbnail_sizes():
+    data, mime = make_thumbnail(_png(800, 600), 200)
+    assert mime == 'image/webp'
+    with Image.open(io.BytesIO(data)) as img:
+        assert img.size == (200, 150)
+
+    # Kleinere afbeeldingen worden niet vergroot
+    data, _ = make_thumbnail(_png(120, 80), 200)
+    with Image.open(io.BytesIO(data)) as img:
+        assert img.size == (120, 80)
+
+    assert make_thumbnail(b"<html>niet gevonden</html>", 200)[1] is None
+
+
+# --- Ophalen ---
+def test_disk_cache_hit_skips_the_network(server):
+    first = fetch_thumbnail(f"{server.url}/foto.png")
+    assert first[1] == 'image/webp'
+    assert fetch_thumbnail(f"{server.url}/foto.png") == first
+    assert server.requests == [('/foto.png', None)]
+
+
+def test_etag_revalidation_returns_cached_thumbnail_on_304(server, monkeypatch):
+    first = fetch_thumbnail(f"{server.url}/foto.png")
+    monkeypatch.setattr(image_cache, "REVALIDATE_AFTER", 0)
+    assert fetch_thumbnail(f"{server.url}/foto.png") == first
+    assert server.requests == [('/foto.png', None), ('/foto.png', ETAG)]
+
+
+def test_failures_are_remembered(server):
+    for path in ('/bestaat-niet.png', '/pagina.html', '/traag'):
+        assert fetch_thumbnail(f"{server.url}{path}") is None
+        assert fetch_thumbnail(f"{server.url}{path}") is None
+    # Elk één keer geprobeerd: een 404, een HTML-pagina en een timeout
+    assert [path for path, _ in server.requests] == ['/bestaat-niet.png', '/pagina.html', '/traag']
+
+
+def test_negative_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(image_cache, "NEGATIVE_MAX_ENTRIES", 3)
+    for i in range(10):
+        image_cache._mark_failed(f"http://dood.example/{i}.png")
+    assert list(image_cache._failures) == [f"http://dood.example/{i}.png" for i in (7, 8, 9)]
+
+    # Verlopen items worden bij het toevoegen opgeruimd
+    later = time.time() + image_cache.NEGATIVE_TTL + 1
+    monkeypatch.setattr(image_cache.time, "time", lambda: later)
+    image_cache._mark_failed("http://dood.example/nieuw.png")
+    assert list(image_cache._failures) == ["http://dood.example/nieuw.png"]
+
+
+def test_image_sources_inlines_the_thumbnail(server):
+    url = f"{server.url}/foto.png"
+    sources = image_sources(url)
+    assert set(sources) == {'src'}
+    assert sources['src'].startswith("data:image/webp;base64,")
+    assert image_sources(url) is sources
+    assert len(server.requests) == 1
+
+
+def test_prefetch_counts_cache_hits_with_perf_enabled_for_this_context(server, monkeypatch):
+    # ?perf=1 zet de vlag enkel voor de context van de rerun; de poolthreads
+    # moeten die toch zien
+    def counts():
+        caches = instrumentation.snapshot()["caches"]
+        return {name: dict(caches.get(name, {"hits": 0, "misses": 0})) for name in ("image_disk", "image_memory")}
+
+    urls = [f"{server.url}/foto.png", f"{server.url}/bestaat-niet.png"]
+    before = counts()
+    instrumentation.set_enabled(True)
+    try:
+        prefetch_images(urls)
+        monkeypatch.setattr(image_cache, "_memory_cache", MemoryLRU(1024 * 1024))
+        prefetch_images(urls)
+    finally:
+        instrumentation.set_enabled(None)
+    after = counts()
+    assert after["image_disk"]["misses"] - before["image_disk"]["misses"] == 2
+    assert after["image_disk"]["hits"] - before["image_disk"]["hits"] == 1
+    assert after["image_memory"]["misses"] - before["image_memory"]["misses"] == 4
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from kaartweergave import GEEN_FOTO, bestemming_kaartjes_html, restaurant_kaartjes_html
+
+FOTO = "https://cdn.example/foto.jpg?w=800&h=600"
+
+
+def _reizen():
+    return pd.DataFrame({
+        'land': ["Italië", "Frankrijk"],
+        'regio': ["Toscane", None],
+        'stad': ["Florence", "Parijs"],
+        'budget': [1500000.0, np.nan],
+        'minimum duur': [3.0, 2.0],
+        'maximum duur': [7.5, 4.0],
+        'temperatuur': [21.0, np.nan],
+        'vervoersmiddel_lijst': [("Trein", "Auto"), ()],
+        'opmerking': ['<script>"x"</script> & co', ''],
+        'url': [' https://reis.example/?a=1&b=2 ', ''],
+        'foto': [f" {FOTO} ", ''],
+    })
+
+
+def test_one_card_per_record_with_escaped_fields():
+    kaarten = bestemming_kaartjes_html(_reizen(), {FOTO: {'src': 'data:image/webp;base64,AAA'}}).split("\n")
+    assert len(kaarten) == 2
+    eerste, tweede = kaarten
+    assert '<img src="data:image/webp;base64,AAA"' in eerste
+    assert '&lt;script&gt;&quot;x&quot;&lt;/script&gt; &amp; co' in eerste
+    assert '<a href="https://reis.example/?a=1&amp;b=2" target="_blank"' in eerste
+    assert "Italië – Toscane – Florence" in eerste
+    # Grote getallen zonder exponent, decimalen zonder nullen
+    assert "<b>Prijs:</b> €1500000</div>" in eerste
+    assert "<b>Duur:</b> 3 - 7.5 dagen</div>" in eerste
+    assert "<b>Vervoersmiddel:</b> Trein, Auto</div>" in eerste
+
+    assert GEEN_FOTO in tweede
+    assert '<span style="color:#fff; font-weight:bold;">Frankrijk –  – Parijs</span>' in tweede
+    assert "<b>Prijs:</b> €</div>" in tweede
+    assert "Overeenkomst" not in tweede
+
+
+def test_match_column_and_missing_columns():
+    html = bestemming_kaartjes_html(_reizen().assign(match=[87, 40]), {})
+    assert "<b>Overeenkomst:</b> 87%</div>" in html
+
+    restaurants = pd.DataFrame({'naam': ["Trattoria & Bar"], 'prijs': ["twee"]})
+    html = restaurant_kaartjes_html(restaurants, {})
+    assert "Trattoria &amp; Bar" in html
+    assert "<b>Prijs:</b> </div>" in html and "<b>Keuken:</b> </div>" in html
+    assert bestemming_kaartjes_html(_reizen().iloc[:0], {}) == ""
@@ -0,0 +1,24 @@
+import pytest
+
+import io
+
+from pdf_export import create_pdf_from_weekplanning, weekplanning_pdf_bytes, write_pdf
+
+DAG = {"bestemming": "Florence", "ontbijt": None, "lunch": "Trattoria", "diner": None}
+
+
+def test_weeks_select_the_days():
+    planning = [dict(DAG, bestemming=f"Stad {i}") for i in range(9)]
+    assert weekplanning_pdf_bytes(planning).startswith(b"%PDF")
+    # Week 2 heeft twee dagen: één pagina
+    assert write_pdf(planning, io.BytesIO(), weken=(2, 2)) == 1
+
+
+@pytest.mark.parametrize("planning, weken", [
+    ([], None),
+    ([DAG], (2, 3)),
+    ([DAG] * 8, (3, 3)),
+])
+def test_no_days_in_range_is_an_error(planning, weken):
+    with pytest.raises(ValueError):
+        create_pdf_from_weekplanning(planning, weken=weken)
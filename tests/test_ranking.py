@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from benchmark import generate_travel_values
+from data_loading import parse_travel_values
+from ranking import TOLERANCE, TravelFeatures, rank_travel_in_memory, top_k
+
+TRAVEL_DF = parse_travel_values(generate_travel_values(500, seed=11))
+
+
+def _full_sort(scores, k, rows):
+    # Referentie: alles sorteren (hoogste eerst, bij gelijke score de originele volgorde)
+    return rows[np.argsort(-scores[rows], kind='stable')][:k]
+
+
+@pytest.mark.parametrize("k", [1, 5, 50, 499, 500, 1000])
+def test_top_k_equals_a_full_sort(k):
+    rng = np.random.default_rng(k)
+    # Weinig verschillende waarden: veel gelijke scores
+    scores = rng.integers(0, 10, 500).astype(np.float32) / 10
+    all_rows = np.arange(500)
+    np.testing.assert_array_equal(top_k(scores, k), _full_sort(scores, k, all_rows))
+    subset = np.sort(rng.choice(500, 200, replace=False))
+    np.testing.assert_array_equal(top_k(scores, k, subset), _full_sort(scores, k, subset))
+
+
+def test_top_k_without_candidates():
+    assert len(top_k(np.zeros(10, dtype=np.float32), 5, np.array([], dtype=np.int64))) == 0
+
+
+def test_scores_are_a_weighted_mean_between_0_and_1():
+    features = TravelFeatures(TRAVEL_DF)
+    scores = features.scores((3, 10), (500, 1500), (15, 25), ["Zomer"], ["Trein"], ["Stedentrip"])
+    assert scores.shape == (len(TRAVEL_DF),)
+    assert scores.min() >= 0 and scores.max() <= 1
+
+    # Enkel budget telt: binnen het bereik 1, ver erbuiten 0
+    only_budget = {name: 0 for name in ('duur', 'temperatuur', 'seizoen', 'vervoersmiddel', 'reistype')}
+    scores = features.scores((3, 10), (500, 1500), (15, 25), [], [], [], only_budget)
+    budget = TRAVEL_DF['budget'].to_numpy()
+    assert (scores[(budget >= 500) & (budget <= 1500)] == 1).all()
+    far = budget > 1500 + TOLERANCE * features.scale['budget']
+    assert far.any() and (scores[far] == 0).all()
+
+
+def test_rank_travel_keeps_hard_filters_and_orders_by_score():
+    args = dict(
+        duur_slider=(3, 10), budget_slider=(500, 1500), continent=["Europa"], reistype=["Stedentrip"],
+        seizoen=["Zomer"], accommodatie=[], temp_slider=(15, 25), vervoersmiddelen=[],
+        land=[], regio=[], stad=[],
+    )
+    ranked, candidates = rank_travel_in_memory(TRAVEL_DF, **args, k=20)
+    europa = TRAVEL_DF['continent'].astype(object) == "Europa"
+    # Continent blijft een harde filter; budget, duur, ... wegen enkel mee
+    assert candidates == europa.sum()
+    assert len(ranked) == 20
+    assert (ranked['continent'].astype(object) == "Europa").all()
+
+    scores = TravelFeatures(TRAVEL_DF).scores(
+        args['duur_slider'], args['budget_slider'], args['temp_slider'], args['seizoen'], [], args['reistype']
+    )
+    expected = _full_sort(scores, 20, np.flatnonzero(europa.to_numpy()))
+    assert list(ranked.index) == list(TRAVEL_DF.index[expected])
+    assert list(ranked['match']) == list(np.rint(scores[expected] * 100).astype(int))
+    assert ranked['match'].is_monotonic_decreasing
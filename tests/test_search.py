@@ -0,0 +1,86 @@
+import gc
+import weakref
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import search
+from search import (
+    EXACT_SCORE, FUZZY_SCORE, PREFIX_SCORE, SearchIndex, TRAVEL_SEARCH_FIELDS,
+    search_scores, travel_search_index
+)
+
+ROWS = [
+    # naam, stad, land, opmerking
+    ("Renaissance in Toscane", "Florence", "Italië", "musea"),
+    ("Lichtstad", "Parijs", "Frankrijk", "Eiffeltoren bij nacht"),
+    ("Fjorden", "Bergen", "Noorwegen", "rustig"),
+    ("Florence en Siena", "Siena", "Italië", ""),
+]
+
+
+def _frame(rows=ROWS, version="v1"):
+    df = pd.DataFrame(rows, columns=["naam", "stad", "land", "opmerking"])
+    df.attrs['data_version'] = version
+    return df
+
+
+@pytest.fixture
+def index():
+    return SearchIndex(_frame(), TRAVEL_SEARCH_FIELDS)
+
+
+def test_exact_prefix_and_typo_matches(index):
+    assert index.matches("florence") == {index.token_ids["florence"]: EXACT_SCORE}
+    assert index.matches("eiffel") == {index.token_ids["eiffeltoren"]: PREFIX_SCORE}
+    # Eén tikfout in een term van 8 letters
+    assert index.matches("florense") == {index.token_ids["florence"]: FUZZY_SCORE[1]}
+    # Geen prefix en te veel verschil met "eiffeltoren"
+    assert index.matches("eifel") == {}
+
+
+def test_scores_rank_by_field_and_require_every_term(index):
+    scores = index.scores("florense")
+    # Een treffer in de naam weegt zwaarder dan in de stad
+    assert scores[3] > scores[0] > 0
+    assert scores[1] == scores[2] == 0
+
+    assert list(np.flatnonzero(index.scores("florence siena"))) == [3]
+    assert not index.scores("florence bergen").any()
+    assert not index.scores("eifel").any()
+    assert list(np.flatnonzero(index.scores("eiffel"))) == [1]
+
+
+def test_accents_and_case_are_ignored(index):
+    for query in ("italie", "ITALIË", "Itàlie"):
+        assert list(np.flatnonzero(index.scores(query))) == [0, 3]
+    assert index.matches("italie") == {index.token_ids["italie"]: EXACT_SCORE}
+
+
+def test_scores_are_cached_per_index(index):
+    first = index.cached_scores("florence")
+    assert index.cached_scores("florence") is first
+    assert not first.flags.writeable
+
+    for i in range(search.SCORES_CACHE_SIZE):
+        index.cached_scores(f"term{i}")
+    assert "florence" not in index._scores_cache
+    assert len(index._scores_cache) == search.SCORES_CACHE_SIZE
+
+
+def test_score_cache_goes_away_with_the_old_data_version():
+    old_df = _frame(version="v1")
+    old_index = travel_search_index(old_df)
+    old_scores = search_scores(old_index, "florence")
+    assert travel_search_index(old_df) is old_index
+    refs = weakref.ref(old_index), weakref.ref(old_scores)
+
+    new_df = _frame(ROWS + [("Florence", "Florence", "Italië", "")], version="v2")
+    new_index = travel_search_index(new_df)
+    assert new_index is not old_index
+    assert len(search_scores(new_index, "florence").nonzero()[0]) == 3
+
+    del old_df, old_index, old_scores
+    gc.collect()
+    assert [ref() for ref in refs] == [None, None]
@@ -0,0 +1,145 @@
+import threading
+import time
+
+import pytest
+
+import data_loading
+import snapshot
+from data_loading import (
+    IncrementalSheet, REFRESH_BACKOFF, RESTAURANT_SCHEMA, RESTAURANTS_RANGE, SharedDataStore,
+    TRAVEL_RANGE, TRAVEL_SCHEMA, parse_restaurants_values, parse_travel_values
+)
+from gsheets_service import FakeSheetsTransport, set_sheets_transport
+
+REIZEN = [
+    ["Land", "Regio", "Stad", "Budget"],
+    ["Italië", "Toscane", "Florence", "1200"],
+]
+RESTAURANTS = [
+    ["Naam", "Stad", "Maaltijd"],
+    ["Trattoria", "Florence", "Lunch"],
+]
+
+
+class SlowTransport(FakeSheetsTransport):
+    # Zoals de fake, maar elke batchGet duurt even, zodat requests overlappen
+    def batch_get(self, ranges):
+        time.sleep(0.2)
+        return super().batch_get(ranges)
+
+
+class FailingTransport:
+    def __init__(self):
+        self.calls = 0
+
+    def batch_get(self, ranges):
+        self.calls += 1
+        raise ConnectionError("Google Sheets onbereikbaar")
+
+
+@pytest.fixture(autouse=True)
+def sheets(tmp_path, monkeypatch):
+    # Lege tabbladen en snapshotmap per test
+    monkeypatch.setattr(snapshot, "SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.setattr(data_loading, "OFFLINE", False)
+    monkeypatch.setattr(data_loading, "SHEETS", {
+        "reizen": (TRAVEL_RANGE, IncrementalSheet(parse_travel_values, TRAVEL_SCHEMA)),
+        "restaurants": (RESTAURANTS_RANGE, IncrementalSheet(parse_restaurants_values, RESTAURANT_SCHEMA)),
+    })
+    monkeypatch.setattr(data_loading, "_snapshot_versions", {})
+    yield
+    set_sheets_transport(None)
+
+
+def _store(monkeypatch, ttl=600):
+    store = SharedDataStore(ttl)
+    # Geen achtergrondthread: de test bepaalt zelf wanneer er ververst wordt
+    monkeypatch.setattr(store, "start", lambda: None)
+    return store
+
+
+def _same(frames, other):
+    # Dezelfde frame-objecten (de tuple zelf wordt bij elke verversing opnieuw gemaakt)
+    return all(a is b for a, b in zip(frames, other))
+
+
+def _wait(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timeout"
+        time.sleep(0.01)
+
+
+def test_concurrent_cold_gets_load_once(monkeypatch):
+    transport = SlowTransport({"Opties": REIZEN, "Restaurants": RESTAURANTS})
+    set_sheets_transport(transport)
+    store = _store(monkeypatch)
+
+    start = threading.Barrier(8)
+    results = []
+
+    def get():
+        start.wait()
+        results.append(store.get())
+
+    threads = [threading.Thread(target=get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert transport.calls == 1
+    assert len(results) == 8 and all(frames is results[0] for frames in results)
+    assert list(results[0][0]['stad']) == ["Florence"]
+
+
+def test_failed_refresh_keeps_stale_data_and_backs_off(monkeypatch):
+    set_sheets_transport(FakeSheetsTransport({"Opties": REIZEN, "Restaurants": RESTAURANTS}))
+    store = _store(monkeypatch)
+    frames = store.get()
+
+    failing = FailingTransport()
+    set_sheets_transport(failing)
+    store.loaded_at -= store.ttl + 1
+    assert store.expired()
+
+    # Verlopen data komt meteen terug; de verversing loopt op de achtergrond
+    before = time.monotonic()
+    assert store.get() is frames
+    _wait(lambda: store.failures == 1 and not store._refreshing)
+    assert failing.calls == 1
+    assert _same(store.frames, frames)
+    assert "laatst bekende data" in store.last_error
+    assert store.retry_at - before >= REFRESH_BACKOFF
+
+    # Tijdens de wachttijd start een request geen nieuwe poging
+    assert _same(store.get(), frames)
+    assert not store.refresh_async()
+    assert failing.calls == 1
+
+    # Elke volgende fout wacht dubbel zo lang
+    before = time.monotonic()
+    assert store.refresh_async(force=True)
+    _wait(lambda: store.failures == 2 and not store._refreshing)
+    assert failing.calls == 2
+    assert store.retry_at - before >= 2 * REFRESH_BACKOFF
+    assert _same(store.frames, frames)
+
+    # Een geslaagde verversing zet de teller terug
+    set_sheets_transport(FakeSheetsTransport({"Opties": REIZEN + [["Frankrijk", "", "Parijs", "900"]], "Restaurants": RESTAURANTS}))
+    assert store.refresh_async(force=True)
+    _wait(lambda: store.failures == 0 and not store._refreshing)
+    assert list(store.frames[0]['stad']) == ["Florence", "Parijs"]
+    assert not store.expired()
+
+
+def test_empty_sheet_never_replaces_loaded_data(monkeypatch):
+    set_sheets_transport(FakeSheetsTransport({"Opties": REIZEN, "Restaurants": RESTAURANTS}))
+    store = _store(monkeypatch)
+    frames = store.get()
+
+    set_sheets_transport(FakeSheetsTransport({"Opties": [], "Restaurants": RESTAURANTS}))
+    assert store.refresh_async(force=True)
+    _wait(lambda: store.loaded_at is not None and not store._refreshing)
+    assert store.frames[0] is frames[0]
+    assert store.last_error == data_loading.EMPTY_SHEET_MESSAGES["reizen"]